@@ -0,0 +1,80 @@
+import pytest
+
+from synthetic import FIELD_TYPES, make_flextext, make_lift, make_vocabulary
+
+# sizes of the generated data; morphemes is the maximum per word
+SCALES = {
+    "small": {
+        "texts": 5,
+        "phrases": 20,
+        "words": 8,
+        "morphemes": 3,
+        "entries": 500,
+        "variants": 50,
+        "senses": 1,
+    },
+    "medium": {
+        "texts": 20,
+        "phrases": 50,
+        "words": 8,
+        "morphemes": 3,
+        "entries": 2000,
+        "variants": 200,
+        "senses": 2,
+    },
+    "large": {
+        "texts": 50,
+        "phrases": 200,
+        "words": 10,
+        "morphemes": 4,
+        "entries": 10000,
+        "variants": 1000,
+        "senses": 2,
+    },
+}
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--scales",
+        default="small,medium",
+        help=f"Comma-separated scales to benchmark ({', '.join(SCALES)})",
+    )
+
+
+def pytest_generate_tests(metafunc):
+    if "scale" in metafunc.fixturenames:
+        scales = metafunc.config.getoption("scales").split(",")
+        metafunc.parametrize("scale", scales, scope="session")
+
+
+@pytest.fixture(scope="session")
+def synthetic_data(tmp_path_factory, scale):
+    """A .flextext corpus and a .lift lexicon containing its morphemes, plus a
+    standalone .lift dictionary with variants and custom fields"""
+    size = SCALES[scale]
+    path = tmp_path_factory.mktemp(scale)
+    vocabulary = make_vocabulary(max(size["entries"] // 5, 40))
+    (path / "corpus.flextext").write_text(
+        make_flextext(
+            size["texts"],
+            size["phrases"],
+            size["words"],
+            size["morphemes"],
+            vocabulary=len(vocabulary),
+        ),
+        encoding="utf-8",
+    )
+    (path / "corpus.lift").write_text(
+        make_lift(vocabulary=vocabulary), encoding="utf-8"
+    )
+    (path / "dictionary.lift").write_text(
+        make_lift(
+            size["entries"],
+            size["variants"],
+            size["senses"],
+            field_types=FIELD_TYPES,
+        ),
+        encoding="utf-8",
+    )
+    return path, size
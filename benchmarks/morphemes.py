@@ -0,0 +1,56 @@
+"""Compare morpheme segmentation of the words in the apalai corpus with ad hoc
+regexes (as previously done in get_form_slices) and with MorphemeTokenizer.
+
+    python benchmarks/morphemes.py [repetitions]
+"""
+import re
+import sys
+import timeit
+from pathlib import Path
+
+from cldflex.flex2csv import init_word_dict, iter_texts, iterate_morphemes
+from cldflex.helpers import DELIMITERS, get_tokenizer
+
+FLEXTEXT = Path(__file__).parent.parent / "tests" / "data" / "apalai.flextext"
+OBJ_KEY, GLOSS_KEY = "txt_apy", "gls_en"
+
+
+def load_words():
+    words = []
+    conf = {"msa_lg": "en"}
+    for text in iter_texts(FLEXTEXT):
+        for word in text.find_all("word"):
+            word_dict = init_word_dict(word, OBJ_KEY, "punct_apy", [])
+            _, _, word_dict = iterate_morphemes(word, word_dict, OBJ_KEY, GLOSS_KEY, conf)
+            if word.find_all("morphemes") and GLOSS_KEY in word_dict:
+                words.append(word_dict)
+    return words
+
+
+def segment_regex(words):
+    for word in words:
+        for _ in zip(
+            re.split(re.compile("|".join(DELIMITERS)), word[OBJ_KEY]),
+            re.split(re.compile("|".join(DELIMITERS)), word[GLOSS_KEY]),
+        ):
+            re.sub("|".join(DELIMITERS), "", word[OBJ_KEY])
+
+
+def segment_tokenizer(words):
+    tokenizer = get_tokenizer()
+    for word in words:
+        tokenizer.strip(word[OBJ_KEY])
+        for _ in zip(tokenizer.split(word[OBJ_KEY]), tokenizer.split(word[GLOSS_KEY])):
+            pass
+
+
+def main(repetitions=200):
+    words = load_words()
+    print(f"{len(words)} analyzed words, {repetitions} repetitions")
+    for func in [segment_regex, segment_tokenizer]:
+        elapsed = timeit.timeit(lambda: func(words), number=repetitions)
+        print(f"{func.__name__:>18}: {elapsed / repetitions * 1000:.3f} ms per corpus pass")
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:]])
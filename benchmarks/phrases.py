@@ -0,0 +1,76 @@
+"""Phrase throughput of flex2csv on a synthetic corpus.
+
+Compares the old per-phrase DataFrame assembly of interlinear lines with
+join_interlinear_lines, then times flex2csv.convert end to end.
+
+    python benchmarks/phrases.py [texts] [phrases per text] [words per phrase]
+"""
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+from synthetic import make_flextext
+
+from cldflex.flex2csv import convert, join_interlinear_lines
+
+
+def dataframe_lines(lines):
+    """The pre-accumulator implementation, kept for comparison"""
+    df = pd.DataFrame.from_dict(lines).fillna("")
+    if len(df) != 0:
+        df.drop(columns=["morph_type"], inplace=True)
+    return {
+        col: "\t".join(df[col]).replace("\t=", "=").replace("=\t", "=")
+        for col in df.columns
+    }
+
+
+def sample_phrase(words):
+    return [
+        {
+            "morph_type": ["root", "suffix"],
+            "txt_xyz": f"word{i}",
+            "morph_xyz": f"wo-rd{i}",
+            "gls_en": f"word{i}-PL",
+            "gls_en_word": f"words{i}",
+            "pos_en_word": "n",
+        }
+        for i in range(words)
+    ] + [{"morph_type": [], "punct_xyz": "."}]
+
+
+def per_second(func, lines, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(lines)
+    return repeat / (time.perf_counter() - start)
+
+
+def main(texts=20, phrases=200, words=8):
+    logging.getLogger("cldflex").setLevel(logging.ERROR)
+    lines = sample_phrase(words)
+    assert dataframe_lines(lines) == join_interlinear_lines(lines)
+    repeat = texts * phrases
+    print("Phrase assembly (phrases/sec)")
+    old = per_second(dataframe_lines, lines, repeat)
+    new = per_second(join_interlinear_lines, lines, repeat)
+    print(f"{'DataFrame':>12} {old:>12,.0f}")
+    print(f"{'accumulator':>12} {new:>12,.0f} ({new / old:.0f}x)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        flextext_file = tmp / "corpus.flextext"
+        flextext_file.write_text(
+            make_flextext(texts, phrases, words), encoding="utf-8"
+        )
+        start = time.perf_counter()
+        convert(flextext_file, output_dir=tmp, conf={"obj_lg": "xyz"})
+        elapsed = time.perf_counter() - start
+    print(f"\nconvert: {repeat} phrases in {elapsed:.2f}s ({repeat / elapsed:,.0f}/sec)")
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,80 @@
+"""Compare the former slug(), which slugified every string twice and searched
+the names handed out so far for a free null-N, with the memoized slug(), on
+field types in different scripts. Then time lift2csv.convert on a lexicon
+with these field types.
+
+    python benchmarks/slugs.py [distinct strings without slug] [calls] [entries]
+"""
+import logging
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from slugify import slugify
+from synthetic import FIELD_TYPES, make_lift
+
+from cldflex.helpers import reset_slugs, slug
+from cldflex.lift2csv import convert
+
+# scripts which slugify can not transliterate
+NO_SLUG = "ꦏꦕꦠꦤꦥꦩꦲ" + "ⴰⴱⴳⴷⴻⴼⴽⵍⵎⵏ"
+
+
+def legacy(string, empty_slugs):
+    if slugify(string) != "":
+        return slugify(string)
+    if string in empty_slugs:
+        return empty_slugs[string]
+    c = 0
+    test_string = f"null-{c}"
+    while test_string in empty_slugs.values():
+        c += 1
+        test_string = f"null-{c}"
+    empty_slugs[string] = test_string
+    return test_string
+
+
+def make_strings(distinct, calls, seed=0):
+    """<calls> strings: field types in several scripts, and <distinct> strings
+    without a slug, each used repeatedly"""
+    rng = random.Random(seed)
+    no_slug = set()
+    while len(no_slug) < distinct:
+        no_slug.add("".join(rng.choice(NO_SLUG) for _ in range(6)))
+    pool = FIELD_TYPES + sorted(no_slug)
+    return [rng.choice(pool) for _ in range(calls)]
+
+
+def main(distinct=2000, calls=100000, entries=5000):
+    logging.getLogger("cldflex").setLevel(logging.ERROR)
+    strings = make_strings(distinct, calls)
+    print(f"{calls} slugs, {distinct} distinct strings without a slug")
+    empty_slugs = {}
+    start = time.perf_counter()
+    expected = [legacy(x, empty_slugs) for x in strings]
+    old = time.perf_counter() - start
+    reset_slugs()
+    start = time.perf_counter()
+    result = [slug(x) for x in strings]
+    new = time.perf_counter() - start
+    assert result == expected
+    print(f"{'former':>10} {old:>8.2f}s")
+    print(f"{'memoized':>10} {new:>8.2f}s ({old / new:.0f}x)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        lift_file = tmp / "dictionary.lift"
+        lift_file.write_text(
+            make_lift(entries, field_types=FIELD_TYPES), encoding="utf-8"
+        )
+        start = time.perf_counter()
+        entries_df = convert(lift_file, output_dir=tmp, conf={})[0]
+        elapsed = time.perf_counter() - start
+    columns = [x for x in entries_df.columns if x.endswith("_en")]
+    print(f"\nconvert: {entries} entries in {elapsed:.2f}s, fields: {', '.join(columns)}")
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:]])
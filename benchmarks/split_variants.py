@@ -0,0 +1,84 @@
+"""Compare the row-wise apply formerly used to expand morphemes into morphs
+with split_into_variants over plain records.
+
+    python benchmarks/split_variants.py [morphemes...]
+"""
+import random
+import sys
+import time
+
+import pandas as pd
+from synthetic import form
+
+from cldflex.lift2csv import split_into_variants
+
+
+def make_morphemes(count, seed=0):
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        allomorphs = [form(rng) for _ in range(rng.randrange(3))]
+        records.append(
+            {
+                "ID": f"m{i}",
+                "Form": form(rng),
+                "Type": "root",
+                "Gloss": [f"gloss{i}"],
+                "Parameter_ID": [f"s{i}"],
+                "Gramm": ["n"],
+                "Variants": allomorphs,
+                "variant_morph-type": ["root"] * len(allomorphs),
+                "Language_ID": "xyz",
+            }
+        )
+    return pd.DataFrame.from_dict(records)
+
+
+def legacy(morphemes, entry_variants):
+    def split(rec, abstract_key):
+        for idx, (form_, morph_type) in enumerate(
+            zip(
+                [rec["Form"]] + rec["Variants"],
+                [rec["Type"]] + rec["variant_morph-type"],
+            )
+        ):
+            new_rec = rec.copy()
+            new_rec[abstract_key] = rec["ID"]
+            new_rec["ID"] = rec["ID"] + f"-{idx}"
+            new_rec["Form"] = form_
+            new_rec["Type"] = morph_type
+            yield dict(new_rec)
+        yield from entry_variants.get(rec["ID"], [])
+
+    morphs = []
+    morphemes.apply(lambda x: morphs.extend(split(x, "Morpheme_ID")), axis=1)
+    return pd.DataFrame.from_dict(morphs)
+
+
+def current(morphemes, entry_variants):
+    return pd.DataFrame.from_dict(
+        [
+            morph
+            for rec in morphemes.to_dict("records")
+            for morph in split_into_variants(rec, "Morpheme_ID", entry_variants)
+        ]
+    )
+
+
+def main(counts=(1000, 10000, 50000)):
+    print(f"{'morphemes':>9} {'morphs':>7} {'apply (s)':>10} {'records (s)':>11}")
+    for count in counts:
+        morphemes = make_morphemes(count)
+        timings, results = [], []
+        for func in [legacy, current]:
+            start = time.perf_counter()
+            results.append(func(morphemes, {}))
+            timings.append(time.perf_counter() - start)
+        pd.testing.assert_frame_equal(*results)
+        morphs = results[1]
+        print(f"{count:>9} {len(morphs):>7} {timings[0]:>10.2f} {timings[1]:>11.2f}")
+
+
+if __name__ == "__main__":
+    args = [int(x) for x in sys.argv[1:]]
+    main(args or (1000, 10000, 50000))
@@ -0,0 +1,155 @@
+"""Generators for synthetic FLEx exports of configurable size."""
+import random
+from uuid import UUID
+
+MORPH_TYPES = ["root", "stem", "suffix", "prefix"]
+# custom field names in different scripts; the last ones have no slug
+FIELD_TYPES = [
+    "Note",
+    "Примечание",
+    "备注",
+    "หมายเหตุ",
+    "ማስታወሻ",
+    "ᏗᏕᎶᏆᏍᏗ",
+    "ꦕꦠꦠꦤ꧀",
+    "ⴰⵎⵢⴰⵏ",
+    "𓂀𓏏",
+]
+
+
+def guid(rng):
+    return str(UUID(int=rng.getrandbits(128), version=4))
+
+
+def form(rng, length=4):
+    return "".join(rng.choice("ptkmnsaeiou") for _ in range(length))
+
+
+def make_lift(
+    entries=1000, variants=0, senses=1, seed=0, vocabulary=None, field_types=()
+):  # pylint: disable=too-many-arguments
+    """A .lift document with <entries> main entries, each with <senses> senses,
+    a custom field for each of <field_types>, and every third one with an
+    allomorph, and <variants> additional entries recorded as variants of
+    random main entries. If a vocabulary is given, there is one main entry
+    for each of its morphemes instead."""
+    rng = random.Random(seed)
+    main_ids = []
+    chunks = ['<?xml version="1.0" encoding="UTF-8" ?>\n<lift version="0.13">']
+    if vocabulary:
+        entries = len(vocabulary)
+    for i in range(entries):
+        entry_guid = guid(rng)
+        if vocabulary:
+            lexeme, gloss, morph_type = vocabulary[i]
+        else:
+            lexeme = form(rng)
+            gloss = f"gloss{i}"
+            morph_type = rng.choice(MORPH_TYPES)
+        main_ids.append(f"{lexeme}_{entry_guid}")
+        chunks.append(
+            f'<entry id="{lexeme}_{entry_guid}" guid="{entry_guid}">'
+            f'<lexical-unit><form lang="xyz"><text>{lexeme}</text></form></lexical-unit>'
+            f'<trait name="morph-type" value="{morph_type}"/>'
+        )
+        for field_type in field_types:
+            chunks.append(
+                f'<field type="{field_type}"><form lang="en">'
+                f"<text>{form(rng)}</text></form></field>"
+            )
+        for j in range(senses):
+            # vocabulary glosses are kept as they are in texts
+            sense_gloss = gloss if vocabulary and j == 0 else f"{gloss}.{j}"
+            chunks.append(
+                f'<sense id="{guid(rng)}"><grammatical-info value="Noun"/>'
+                f'<gloss lang="en"><text>{sense_gloss}</text></gloss></sense>'
+            )
+        if i % 3 == 0:  # allomorph
+            chunks.append(
+                f'<variant><form lang="xyz"><text>{form(rng)}</text></form>'
+                f'<trait name="morph-type" value="{morph_type}"/></variant>'
+            )
+        chunks.append("</entry>")
+    for i in range(variants):
+        entry_guid = guid(rng)
+        lexeme = form(rng)
+        chunks.append(
+            f'<entry id="{lexeme}_{entry_guid}" guid="{entry_guid}">'
+            f'<lexical-unit><form lang="xyz"><text>{lexeme}</text></form></lexical-unit>'
+            '<trait name="morph-type" value="root"/>'
+            f'<relation type="_component-lexeme" ref="{rng.choice(main_ids)}">'
+            '<trait name="variant-type" value="Free Variant"/></relation>'
+            f'<sense id="{guid(rng)}"><grammatical-info value="Noun"/>'
+            f'<gloss lang="en"><text>variant{i}</text></gloss></sense>'
+            "</entry>"
+        )
+    chunks.append("</lift>")
+    return "\n".join(chunks)
+
+
+def make_vocabulary(size=200, seed=0):
+    """Roots and suffixes as (form, gloss, morph type) triples; every fourth one is a suffix"""
+    rng = random.Random(seed)
+    vocabulary = []
+    for i in range(size):
+        if i % 4 == 3:
+            vocabulary.append((form(rng, 2), f"SFX{i}", "suffix"))
+        else:
+            vocabulary.append((form(rng), f"root{i}", "root"))
+    return vocabulary
+
+
+def morph_xml(obj, gloss, morph_type):
+    if morph_type == "suffix":
+        obj = "-" + obj
+    return (
+        f'<morph type="{morph_type}"><item type="txt" lang="xyz">{obj}</item>'
+        f'<item type="gls" lang="en">{gloss}</item>'
+        f'<item type="msa" lang="en">{"n" if morph_type == "root" else "n:Any"}</item>'
+        "</morph>"
+    )
+
+
+def make_flextext(
+    texts=10, phrases=50, words=8, morphemes=3, vocabulary=200, seed=0
+):  # pylint: disable=too-many-arguments,too-many-locals
+    """A .flextext document with <texts> texts of <phrases> phrases of <words>
+    words (plus punctuation), with one root and up to <morphemes> - 1 suffixes.
+    Words with the same analysis share a GUID, like FLEx wordforms."""
+    rng = random.Random(seed)
+    vocab = make_vocabulary(vocabulary, seed)
+    roots = [x for x in vocab if x[2] == "root"]
+    suffixes = [x for x in vocab if x[2] == "suffix"]
+    word_guids = {}
+    chunks = ['<?xml version="1.0" encoding="utf-8"?>\n<document version="2">']
+    for t in range(texts):
+        chunks.append(
+            f'<interlinear-text guid="{guid(rng)}">'
+            f'<item type="title" lang="en">Text {t}</item>'
+            f'<item type="title-abbreviation" lang="xyz">t{t}</item><paragraphs>'
+        )
+        for p in range(phrases):
+            chunks.append(
+                f'<paragraph guid="{guid(rng)}"><phrases><phrase guid="{guid(rng)}">'
+                f'<item type="segnum" lang="en">{p + 1}</item><words>'
+            )
+            for _ in range(words):
+                analysis = (rng.choice(roots),) + tuple(
+                    rng.choice(suffixes) for _ in range(rng.randrange(morphemes))
+                )
+                word_guid = word_guids.setdefault(analysis, guid(rng))
+                chunks.append(
+                    f'<word guid="{word_guid}">'
+                    f'<item type="txt" lang="xyz">{"".join(x[0] for x in analysis)}</item>'
+                    f'<morphemes>{"".join(morph_xml(*x) for x in analysis)}</morphemes>'
+                    f'<item type="gls" lang="en">{analysis[0][1]}</item>'
+                    f'<item type="pos" lang="en">n</item></word>'
+                )
+            chunks.append(
+                '<word><item type="punct" lang="xyz">.</item></word></words>'
+                f'<item type="gls" lang="en">Phrase {p + 1}.</item>'
+                "</phrase></phrases></paragraph>"
+            )
+        chunks.append("</paragraphs></interlinear-text>")
+    chunks.append("</document>")
+    return "\n".join(chunks)
@@ -0,0 +1,107 @@
+"""End-to-end throughput and peak memory of the converters on synthetic data.
+
+    pip install pytest-benchmark
+    pytest benchmarks --scales small,medium,large
+
+Throughput and peak RSS end up in the extra_info of each benchmark, e.g. in
+the output of --benchmark-json.
+"""
+import json
+import subprocess
+import sys
+
+import humidifier
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+# each conversion is measured once in a fresh interpreter for its peak RSS
+MEMORY_SCRIPT = """
+import json, logging, sys
+from pathlib import Path
+logging.getLogger("cldflex").setLevel(logging.ERROR)
+from cldflex.{module} import convert
+from cldflex.profiling import peak_rss
+files = {{key: Path(value) for key, value in json.loads(sys.argv[4]).items()}}
+convert(Path(sys.argv[1]), output_dir=Path(sys.argv[2]), conf=json.loads(sys.argv[3]), **files)
+print(peak_rss())
+"""
+
+
+def measure_peak_rss(module, path, output_dir, conf, **files):
+    output_dir.mkdir(exist_ok=True)
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            MEMORY_SCRIPT.format(module=module),
+            str(path),
+            str(output_dir),
+            json.dumps(conf),
+            json.dumps({key: str(value) for key, value in files.items()}),
+        ],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return int(result.stdout.strip().splitlines()[-1])
+
+
+def run(benchmark, func, **kwargs):
+    def setup():
+        # IDs are registered per process, as in a single CLI run
+        humidifier.og_humidifier = humidifier.Humidifier()
+
+    return benchmark.pedantic(
+        func, kwargs=kwargs, setup=setup, rounds=3, warmup_rounds=0
+    )
+
+
+def record_throughput(benchmark, unit, count):
+    benchmark.extra_info[unit] = count
+    if benchmark.stats:  # not set with --benchmark-disable
+        benchmark.extra_info[f"{unit}_per_second"] = count / benchmark.stats["mean"]
+
+
+@pytest.fixture(autouse=True)
+def quiet(caplog):
+    caplog.set_level("ERROR", logger="cldflex")
+
+
+@pytest.mark.parametrize("lexicon", [False, True], ids=["corpus", "with-lexicon"])
+def test_flex2csv(benchmark, synthetic_data, lexicon, tmp_path, monkeypatch):
+    from cldflex.flex2csv import convert  # pylint: disable=import-outside-toplevel
+
+    monkeypatch.setattr(humidifier, "og_humidifier", humidifier.Humidifier())
+    path, size = synthetic_data
+    kwargs = {"conf": {"obj_lg": "xyz", "gloss_lg": "en"}, "output_dir": tmp_path}
+    if lexicon:
+        kwargs["lexicon_file"] = path / "corpus.lift"
+    run(benchmark, convert, flextext_file=path / "corpus.flextext", **kwargs)
+    record_throughput(benchmark, "phrases", size["texts"] * size["phrases"])
+    benchmark.extra_info["peak_rss"] = measure_peak_rss(
+        "flex2csv",
+        path / "corpus.flextext",
+        tmp_path / "memory",
+        kwargs["conf"],
+        **({"lexicon_file": path / "corpus.lift"} if lexicon else {}),
+    )
+
+
+def test_lift2csv(benchmark, synthetic_data, tmp_path, monkeypatch):
+    from cldflex.lift2csv import convert  # pylint: disable=import-outside-toplevel
+
+    monkeypatch.setattr(humidifier, "og_humidifier", humidifier.Humidifier())
+    path, size = synthetic_data
+    conf = {"obj_lg": "xyz", "gloss_lg": "en"}
+    run(
+        benchmark,
+        convert,
+        lift_file=path / "dictionary.lift",
+        output_dir=tmp_path,
+        conf=conf,
+    )
+    record_throughput(benchmark, "entries", size["entries"] + size["variants"])
+    benchmark.extra_info["peak_rss"] = measure_peak_rss(
+        "lift2csv", path / "dictionary.lift", tmp_path / "memory", conf
+    )
@@ -0,0 +1,42 @@
+"""Time lift2csv.convert on synthetic lexicons with a growing number of variants.
+
+    python benchmarks/variants.py [entries] [variant counts...]
+"""
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import make_lift
+
+from cldflex.lift2csv import convert
+
+
+def main(entries=2000, variant_counts=(0, 250, 500, 1000, 2000)):
+    logging.getLogger("cldflex").setLevel(logging.ERROR)
+    conf = {"obj_lg": "xyz", "gloss_lg": "en"}
+    print(f"{'variants':>8} {'seconds':>8} {'ms/variant':>10}")
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for variants in variant_counts:
+            lift_file = tmp / f"{variants}.lift"
+            lift_file.write_text(make_lift(entries, variants), encoding="utf-8")
+            start = time.perf_counter()
+            convert(lift_file, output_dir=tmp, conf=conf)
+            elapsed = time.perf_counter() - start
+            if baseline is None:
+                baseline = elapsed
+            per_variant = (elapsed - baseline) / variants * 1000 if variants else 0
+            print(f"{variants:>8} {elapsed:>8.2f} {per_variant:>10.3f}")
+
+
+if __name__ == "__main__":
+    args = [int(x) for x in sys.argv[1:]]
+    if len(args) > 1:
+        main(args[0], args[1:])
+    elif args:
+        main(args[0])
+    else:
+        main()
@@ -14,3 +14,5 @@ log.addHandler(handler)
 
 
 SEPARATOR = "; "
+TABLE_FORMATS = ["csv", "parquet", "feather", "sqlite"]
+VALIDATION_MODES = ["full", "sample", "off"]
@@ -1,6 +1,9 @@
 import importlib
 import logging
+import random
+import shutil
 import sys
+import tempfile
 from pathlib import Path
 
 import cldf_ldd
@@ -8,18 +11,32 @@ import pandas as pd
 from cldfbench import CLDFSpec
 from cldfbench.cldf import CLDFWriter
 from cldfbench.metadata import Metadata
+from csvw import Dialect, UnicodeReaderWithLineNumber
 from humidifier import humidify
+from pycldf import Dataset
 from pycldf.util import metadata2markdown
 from writio import dump
 
-from cldflex import SEPARATOR
+from cldflex import SEPARATOR, VALIDATION_MODES
 from cldflex.helpers import listify
+from cldflex.profiling import stage
 
 version = importlib.metadata.version("cldflex")
 
 
 log = logging.getLogger(__name__)
 
+CHUNK_SIZE = 10000
+SAMPLE_SIZE = 1000
+
+
+def iter_records(df, chunksize=CHUNK_SIZE):
+    """Yield the rows of a dataframe as dicts, converting one chunk at a time.
+    Passed to writer.objects, this streams tables to disk when the writer exits
+    instead of holding a second, list-of-dicts copy of each table"""
+    for start in range(0, len(df), chunksize):
+        yield from df.iloc[start : start + chunksize].to_dict("records")
+
 
 def add_example_slices(sentence_slices, writer):
     writer.cldf.add_component(
@@ -66,8 +83,7 @@ def add_example_slices(sentence_slices, writer):
     writer.cldf.add_foreign_key("ExampleSlices", "Parameter_ID", "ParameterTable", "ID")
     writer.cldf.add_foreign_key("ExampleSlices", "Example_ID", "ExampleTable", "ID")
 
-    for ex_slice in sentence_slices.to_dict("records"):
-        writer.objects["ExampleSlices"].append(ex_slice)
+    writer.objects["ExampleSlices"] = iter_records(sentence_slices)
 
 
 def modify_params(df, mode="multi", sep=SEPARATOR, param_dict={}):
@@ -148,11 +164,149 @@ def add_language(writer, cwd, glottocode, iso):  # pragma: no cover
 
 
 def write_readme(ds):
-    readme = metadata2markdown(ds, ds.directory)
-    dump(
-        f"**This dataset was automatically created by [cldflex](https://pypi.org/project/cldflex).**\n\n{readme}",
-        ds.directory / "README.md",
-    )
+    with stage("readme"):
+        readme = metadata2markdown(ds, ds.directory)
+        dump(
+            f"**This dataset was automatically created by [cldflex](https://pypi.org/project/cldflex).**\n\n{readme}",
+            ds.directory / "README.md",
+        )
+
+
+def validate_schema(ds, validators=None):
+    """Validate the metadata of a dataset against copies of its tables without rows"""
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        shutil.copy(ds.directory / ds.filename, tmp / ds.filename)
+        for table in ds.tables:
+            table.write([], fname=tmp / str(table.url))
+        return Dataset.from_metadata(tmp / ds.filename).validate(
+            log=log, validators=validators
+        )
+
+
+def iter_rows(table, dialect):
+    """Yield the line numbers and unparsed rows of a table, read as csvw does"""
+    columns = [col.header for col in table.tableSchema.columns if not col.virtual]
+    with UnicodeReaderWithLineNumber(
+        table.url.resolve(table.base), dialect=dialect
+    ) as reader:
+        reader = iter(reader)
+        if dialect.header:
+            _, columns = next(reader, (None, columns))
+        for lineno, row in reader:
+            yield lineno, dict(zip(columns, row))
+
+
+def split_values(value, column):
+    if column is not None and column.separator:
+        return [x for x in value.split(column.separator) if x]
+    return [value] if value else []
+
+
+def key_values(row, names, columns):
+    """The values of the (composite) key made up of the columns <names> in a row"""
+    if len(names) == 1:
+        values = split_values(row.get(names[0], ""), columns.get(names[0]))
+        return {(x,) for x in values}
+    key = tuple(row.get(name, "") for name in names)
+    return {key} if any(key) else set()
+
+
+def validate_sample(ds, sample_size=SAMPLE_SIZE, validators=None, seed=0):
+    """Validate the schema, the values of a random sample of rows per table,
+    and all primary and foreign keys"""
+    success = validate_schema(ds, validators)
+    rng = random.Random(seed)
+    tables = {str(table.url): table for table in ds.tables}
+    # the (composite) keys of each table whose values are collected
+    key_columns = {
+        url: {tuple(table.tableSchema.primaryKey or [])} - {()}
+        for url, table in tables.items()
+    }
+    for url, table in tables.items():
+        for fk in table.tableSchema.foreignKeys:
+            key_columns[url].add(tuple(fk.columnReference))
+            key_columns.setdefault(str(fk.reference.resource), set()).add(
+                tuple(fk.reference.columnReference)
+            )
+    values = {}
+    for url, table in tables.items():
+        columns = {
+            col.header: col for col in table.tableSchema.columns if not col.virtual
+        }
+        primary_key = tuple(table.tableSchema.primaryKey or [])
+        values[url] = {names: set() for names in key_columns[url]}
+        sample = []
+        dialect = table.dialect or ds.tablegroup.dialect or Dialect()
+        for idx, (lineno, row) in enumerate(iter_rows(table, dialect)):
+            if idx < sample_size:
+                sample.append((lineno, row))
+            else:
+                pick = rng.randrange(idx + 1)
+                if pick < sample_size:
+                    sample[pick] = (lineno, row)
+            if primary_key:
+                key = tuple(row.get(name, "") for name in primary_key)
+                if key in values[url][primary_key]:
+                    success = False
+                    log.warning(
+                        f"{url}:{lineno} duplicate primary key {', '.join(key)}"
+                    )
+            for names, collected in values[url].items():
+                collected.update(key_values(row, names, columns))
+        for lineno, row in sample:
+            for name, col in columns.items():
+                try:
+                    col.read(row.get(name, ""))
+                except ValueError as e:
+                    success = False
+                    log.warning(f"{url}:{lineno}:{name} {e}")
+    for url, table in tables.items():
+        for fk in table.tableSchema.foreignKeys:
+            target = str(fk.reference.resource)
+            if target not in values:
+                success = False
+                log.warning(f"{url} references missing table {target}")
+                continue
+            missing = (
+                values[url][tuple(fk.columnReference)]
+                - values[target][tuple(fk.reference.columnReference)]
+            )
+            for value in sorted(missing):
+                success = False
+                log.warning(
+                    f"{url}:{', '.join(fk.columnReference)} key {', '.join(value)}"
+                    f" not found in {target}"
+                )
+    return success
+
+
+def validate_dataset(ds, mode="full", sample_size=SAMPLE_SIZE, validators=None):
+    """Validate a dataset fully, by sampling rows, or not at all"""
+    if mode == "off":
+        log.info("Skipping validation")
+        return True
+    if mode not in VALIDATION_MODES:
+        raise ValueError(
+            f"Unknown validation mode '{mode}', use one of {', '.join(VALIDATION_MODES)}"
+        )
+    with stage("validate"):
+        if mode == "full":
+            valid = ds.validate(log=log, validators=validators)
+        else:
+            log.info(f"Validating schema, keys and up to {sample_size} rows per table")
+            valid = validate_sample(ds, sample_size, validators)
+    if valid:
+        log.info(f"Validated dataset at {ds.directory.resolve()}/{ds.filename}")
+    return valid
+
+
+def get_validation(cldf_settings, mode=None):
+    """Validation arguments from the cldf configuration; a passed mode takes precedence"""
+    return {
+        "validation": mode or cldf_settings.get("validation", "full"),
+        "sample_size": cldf_settings.get("validation_sample_size", SAMPLE_SIZE),
+    }
 
 
 def create_corpus_dataset(
@@ -164,7 +318,9 @@ def create_corpus_dataset(
     cwd=".",
     sep=SEPARATOR,
     parameters="multi",
-):
+    validation="full",
+    sample_size=SAMPLE_SIZE,
+):  # pylint: disable=too-many-arguments
     cldf_dict = {"examples": "ExampleTable", "media": "MediaTable"}
     if parameters:
         cldf_dict["senses"] = "ParameterTable"
@@ -244,20 +400,17 @@ def create_corpus_dataset(
                 )
         for name, table in table_dict.items():
             if name in tables:
-                for rec in tables[name].to_dict("records"):
-                    writer.objects[table["url"]].append(rec)
+                writer.objects[table["url"]] = iter_records(tables[name])
 
         for name, table in cldf_dict.items():
             if name in tables:
-                for rec in tables[name].to_dict("records"):
-                    writer.objects[table].append(rec)
+                writer.objects[table] = iter_records(tables[name])
     add_metadata(writer, metadata)
     cldf_ldd.add_keys(writer.cldf)
     writer.write()
 
     ds = writer.cldf
-    if ds.validate(log=log):
-        log.info(f"Validated dataset at {ds.directory.resolve()}/{ds.filename}")
+    if validate_dataset(ds, validation, sample_size):
         write_readme(ds)
 
 
@@ -299,8 +452,7 @@ def write_wordlist_dataset(  # noqa: MC0001
         elif parameters == "single":  # force 1 meaning in cases of polysemy
             forms = modify_params(forms, mode="single")
         for table, df in tablelist:
-            for rec in df.to_dict("records"):
-                writer.objects[table].append(rec)
+            writer.objects[table] = iter_records(df)
         writer.write()
         return writer.cldf
 
@@ -315,7 +467,9 @@ def create_wordlist_dataset(
     cwd=".",
     sep=SEPARATOR,
     parameters="multi",
-):
+    validation="full",
+    sample_size=SAMPLE_SIZE,
+):  # pylint: disable=too-many-arguments
     log.info("Creating CLDF dataset")
     ds = write_wordlist_dataset(
         forms,
@@ -328,8 +482,7 @@ def create_wordlist_dataset(
         sep=sep,
         parameters=parameters,
     )
-    if ds.validate(log=log, validators=cldf_ldd.validators):
-        log.info(f"Validated dataset at {ds.directory.resolve()}/{ds.filename}")
+    if validate_dataset(ds, validation, sample_size, validators=cldf_ldd.validators):
         write_readme(ds)
 
 
@@ -347,14 +500,11 @@ def write_dictionary_dataset(
     with CLDFWriter(spec) as writer:
         entries["Headword"] = entries["Form"]
         entries["Part_Of_Speech"] = entries["Gramm"]
-        for entry in entries.to_dict("records"):
-            writer.objects["EntryTable"].append(entry)
-        for sense in senses.to_dict("records"):
-            writer.objects["SenseTable"].append(sense)
+        writer.objects["EntryTable"] = iter_records(entries)
+        writer.objects["SenseTable"] = iter_records(senses)
         if len(examples) > 0:
             writer.cldf.add_component("ExampleTable")
-            for example in examples.to_dict("records"):
-                writer.objects["ExampleTable"].append(example)
+            writer.objects["ExampleTable"] = iter_records(examples)
         if glottocode:
             add_language(writer, cwd, glottocode, iso)
         if metadata:
@@ -364,8 +514,16 @@ def write_dictionary_dataset(
 
 
 def create_dictionary_dataset(
-    entries, senses, examples, glottocode=None, metadata=None, output_dir=".", cwd="."
-):
+    entries,
+    senses,
+    examples,
+    glottocode=None,
+    metadata=None,
+    output_dir=".",
+    cwd=".",
+    validation="full",
+    sample_size=SAMPLE_SIZE,
+):  # pylint: disable=too-many-arguments
     metadata = metadata or {}
     ds = write_dictionary_dataset(
         entries,
@@ -376,6 +534,5 @@ def create_dictionary_dataset(
         output_dir=output_dir,
         cwd=cwd,
     )
-    if ds.validate(log=log):
-        log.info(f"Validated dataset at {ds.directory.resolve()}/{ds.filename}")
+    if validate_dataset(ds, validation, sample_size):
         write_readme(ds)
@@ -1,15 +1,25 @@
 """Console script for cldflex."""
 import sys
+from contextlib import nullcontext
 from pathlib import Path
 
 import click
-from writio import load
 
-from cldflex.flex2csv import convert as flex2csv_convert
-from cldflex.lift2csv import convert as lift2csv_convert
+from cldflex import TABLE_FORMATS, VALIDATION_MODES, profiling
+
+# the converters and their dependencies are only imported by the commands
+# using them, so that e.g. --help is fast; CLDF dependencies are only
+# imported when creating a dataset
+# pylint: disable=import-outside-toplevel
+
+
+def _config_path(config_file):
+    return config_file or Path("cldflex.yaml")
 
 
 def _load_config(config_file):
+    from writio import load
+
     if not config_file:
         if Path("cldflex.yaml").is_file():
             return load("cldflex.yaml")
@@ -17,6 +27,12 @@ def _load_config(config_file):
     return load(config_file)
 
 
+def _profile(enabled, output_dir):
+    if not enabled:
+        return nullcontext()
+    return profiling.profile(Path(output_dir) / "profile.json")
+
+
 @click.group()
 def main():
     pass  # pragma: no cover
@@ -39,16 +55,66 @@ def main():
     default=None,
 )
 @click.option("-d", "--cldf", "cldf", default=False, is_flag=True)
-def dictionary(filename, config_file, cldf, output_dir):
+@click.option(
+    "--validation",
+    "validation",
+    type=click.Choice(VALIDATION_MODES),
+    default=None,
+    help="How to validate the CLDF dataset (default: full, or as configured).",
+)
+@click.option(
+    "--format",
+    "table_format",
+    type=click.Choice(TABLE_FORMATS),
+    default="csv",
+    help="File format of the output tables; parquet and feather keep list columns.",
+)
+@click.option(
+    "--profile",
+    "profile",
+    default=False,
+    is_flag=True,
+    help="Write time and memory used per stage to profile.json in the output directory.",
+)
+@click.option(
+    "--watch",
+    "watch",
+    default=False,
+    is_flag=True,
+    help="Convert again whenever the input files or the configuration change.",
+)
+def dictionary(
+    filename,
+    config_file,
+    cldf,
+    output_dir,
+    validation,
+    table_format,
+    profile,
+    watch,
+):  # pylint: disable=too-many-arguments
     if not output_dir:
         output_dir = Path(filename.parents[0])
-    lift2csv_convert(
-        filename,
-        conf=_load_config(config_file),
-        cldf=cldf,
-        output_dir=output_dir,
-        cldf_mode="dictionary",
-    )
+    from cldflex.lift2csv import convert as lift2csv_convert
+
+    def convert():
+        with _profile(profile, output_dir):
+            lift2csv_convert(
+                filename,
+                conf=_load_config(config_file),
+                cldf=cldf,
+                output_dir=output_dir,
+                cldf_mode="dictionary",
+                validation=validation,
+                table_format=table_format,
+            )
+
+    if watch:
+        from cldflex.watch import watch as watch_files
+
+        watch_files(convert, lambda: [filename, _config_path(config_file)])
+    else:
+        convert()
 
 
 @main.command()
@@ -69,24 +135,60 @@ def dictionary(filename, config_file, cldf, output_dir):
 )
 @click.option("-d", "--cldf", "cldf", default=False, is_flag=True)
 @click.option("-d", "--rich", "rich", default=False, is_flag=True)
-def wordlist(filename, config_file, cldf, output_dir, rich):
+@click.option(
+    "--validation",
+    "validation",
+    type=click.Choice(VALIDATION_MODES),
+    default=None,
+    help="How to validate the CLDF dataset (default: full, or as configured).",
+)
+@click.option(
+    "--format",
+    "table_format",
+    type=click.Choice(TABLE_FORMATS),
+    default="csv",
+    help="File format of the output tables; parquet and feather keep list columns.",
+)
+@click.option(
+    "--profile",
+    "profile",
+    default=False,
+    is_flag=True,
+    help="Write time and memory used per stage to profile.json in the output directory.",
+)
+def wordlist(
+    filename,
+    config_file,
+    cldf,
+    output_dir,
+    rich,
+    validation,
+    table_format,
+    profile,
+):  # pylint: disable=too-many-arguments
     if not output_dir:
         output_dir = Path(filename.parents[0])
     if rich:
         cldf_mode = "rich"
     else:
         cldf_mode = "wordlist"
-    lift2csv_convert(
-        filename,
-        conf=_load_config(config_file),
-        cldf=cldf,
-        output_dir=output_dir,
-        cldf_mode=cldf_mode,
-    )
+    from cldflex.lift2csv import convert as lift2csv_convert
+
+    with _profile(profile, output_dir):
+        lift2csv_convert(
+            filename,
+            conf=_load_config(config_file),
+            cldf=cldf,
+            output_dir=output_dir,
+            cldf_mode=cldf_mode,
+            validation=validation,
+            table_format=table_format,
+        )
 
 
 @main.command()
-@click.argument("filename", type=click.Path(exists=True, path_type=Path))
+# files, directories, or glob patterns, converted into a single corpus
+@click.argument("filenames", nargs=-1, required=True, type=click.Path(path_type=Path))
 @click.option(
     "-c",
     "--conf",
@@ -116,18 +218,99 @@ def wordlist(filename, config_file, cldf, output_dir, rich):
     default=None,
 )
 @click.option("-d", "--cldf", "cldf", default=False, is_flag=True)
-def corpus(filename, config_file, lexicon_file, audio_folder, cldf, output_dir):
-    conf = _load_config(config_file)
+@click.option(
+    "-j",
+    "--jobs",
+    "jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Number of processes used for extracting texts.",
+)
+@click.option(
+    "--cache",
+    "cache",
+    default=False,
+    is_flag=True,
+    help="Reuse texts extracted in previous runs if they have not changed.",
+)
+@click.option(
+    "--validation",
+    "validation",
+    type=click.Choice(VALIDATION_MODES),
+    default=None,
+    help="How to validate the CLDF dataset (default: full, or as configured).",
+)
+@click.option(
+    "--format",
+    "table_format",
+    type=click.Choice(TABLE_FORMATS),
+    default="csv",
+    help="File format of the output tables; parquet and feather keep list columns.",
+)
+@click.option(
+    "--profile",
+    "profile",
+    default=False,
+    is_flag=True,
+    help="Write time and memory used per stage to profile.json in the output directory.",
+)
+@click.option(
+    "--watch",
+    "watch",
+    default=False,
+    is_flag=True,
+    help="Convert again whenever the input files or the configuration change.",
+)
+def corpus(
+    filenames,
+    config_file,
+    lexicon_file,
+    audio_folder,
+    cldf,
+    output_dir,
+    jobs,
+    cache,
+    validation,
+    table_format,
+    profile,
+    watch,
+):  # pylint: disable=too-many-arguments,too-many-locals
     if not output_dir:
         output_dir = Path(".")
-    flex2csv_convert(
-        filename,
-        conf=conf,
-        lexicon_file=lexicon_file,
-        cldf=cldf,
-        output_dir=output_dir,
-        audio_folder=audio_folder,
-    )
+    from cldflex.flex2csv import MemoryCache
+    from cldflex.flex2csv import convert as flex2csv_convert
+    from cldflex.flex2csv import expand_flextext_paths
+
+    if watch:
+        # the lexicon and unchanged texts are kept in memory between runs
+        cache = MemoryCache()
+
+    def convert():
+        with _profile(profile, output_dir):
+            flex2csv_convert(
+                filenames,
+                conf=_load_config(config_file),
+                lexicon_file=lexicon_file,
+                cldf=cldf,
+                output_dir=output_dir,
+                audio_folder=audio_folder,
+                jobs=jobs,
+                cache=cache,
+                validation=validation,
+                table_format=table_format,
+            )
+
+    if watch:
+        from cldflex.watch import watch as watch_files
+
+        watch_files(
+            convert,
+            # files missing while they are saved count as changes
+            lambda: expand_flextext_paths(filenames)
+            + [lexicon_file, _config_path(config_file)],
+        )
+    else:
+        convert()
 
 
 if __name__ == "__main__":
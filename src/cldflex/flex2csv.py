@@ -1,35 +1,214 @@
+import glob
+import hashlib
 import logging
 import os
+import pickle
 import re
-from itertools import chain
+import sys
+import tempfile
+from collections import Counter
+from functools import lru_cache
+from importlib.metadata import version
+from itertools import chain, islice
+from multiprocessing import Pool
 from pathlib import Path
 from string import punctuation
 
 import pandas as pd
 import yaml
-from bs4 import BeautifulSoup
-from humidifier import get_values, humidify
-from morphinder import Morphinder
-from writio import dump
+import humidifier
+from humidifier import Humidifier, get_values, humidify
 
 from cldflex import SEPARATOR
-from cldflex.cldf import create_corpus_dataset
-from cldflex.helpers import delistify, listify
+from cldflex.helpers import (
+    deduplicate,
+    delistify,
+    file_hash,
+    get_tokenizer,
+    hash_values,
+    iter_xml_fragments,
+    listify,
+    parse_fragment,
+    report_stats,
+    require_arrow,
+    write_table,
+)
 from cldflex.lift2csv import convert as lift2csv
+from cldflex.profiling import stage, timed
 
 log = logging.getLogger(__name__)
 # log.setLevel(logging.DEBUG)
 
-delimiters = ["-", "<", ">", "~"]
-
 punc = set(punctuation)
 
+id_placeholder = re.compile("\x00(\\d+)\x00")
+gloss_pattern = re.compile(r"\.\b")
+
+
+class IDRecorder(Humidifier):
+    """Stands in for the humidifier registry when texts are processed in
+    worker processes. IDs are handed out as placeholders and the calls are
+    recorded, so that the main process can replay them in text order."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+        self.scope = None
+
+    def humidify(self, text, key="default", unique=False, **kwargs):
+        self.calls.append((self.scope, text, key, unique))
+        return f"\x00{len(self.calls) - 1}\x00"
+
+
+class MorphRetriever:
+    """Looks up morph IDs in the lexicon for all texts of a conversion,
+    memoizing the results for (form, gloss, morph type) combinations. Entries
+    are chosen as by morphinder: the only one with the form and gloss, else the
+    only one of those with the morph type, else the first one."""
+
+    def __init__(self, lexicon, maxsize=2**16):
+        self.forms = dict(iter(lexicon.groupby("Form_Bare", sort=False)))
+        self.failed = set()
+        self.retrieve = lru_cache(maxsize=maxsize)(self._retrieve)
+
+    def _retrieve(self, obj, gloss, morph_type):
+        bare_gloss = gloss.strip("=").strip("-")
+        candidates = self.forms.get(obj)
+        if candidates is not None:
+            candidates = candidates[
+                candidates["Gloss"].apply(lambda x: bare_gloss in x)
+            ]
+        if candidates is None or candidates.empty:
+            if (obj, gloss) not in self.failed:
+                log.warning(f"No hits for /{obj}/ '{gloss}' in lexicon!")
+                self.failed.add((obj, gloss))
+            return None, None
+        if len(candidates) > 1 and "Type" in candidates:
+            narrowed = candidates[candidates["Type"] == morph_type]
+            if len(narrowed) == 1:
+                candidates = narrowed
+        if len(candidates) > 1:
+            log.warning(
+                f"Multiple lexicon entries for {obj} '{gloss}' ({morph_type}),"
+                f" using the first hit: {', '.join(map(str, candidates['ID']))}"
+            )
+        entry = candidates.iloc[0]
+        return entry["ID"], entry["Parameter_ID"][entry["Gloss"].index(bare_gloss)]
+
+    @property
+    def lookups(self):
+        """Memoized and new lookups so far"""
+        info = self.retrieve.cache_info()
+        return info.hits, info.misses
+
+
+class IDMemo:
+    """Remembers the IDs of glosses and meanings, so that every distinct string
+    is only passed to humidify once. IDs are kept per registry and, for an
+    IDRecorder, per scope, so that placeholders are only reused where the
+    recorded call is replayed. Lookups are counted per scope as well, so that
+    merge_text can leave out the ones a serial run would not have made."""
+
+    def __init__(self):
+        self.registry = None
+        self.ids = {}
+        self.counts = {}
+
+    def reset(self):
+        self.__init__()
+
+    def humidify(self, text, key):
+        registry = humidifier.og_humidifier
+        if registry is not self.registry:
+            self.registry = registry
+            self.ids = {}
+        scope = getattr(registry, "scope", None)
+        self.counts.setdefault(scope, Counter())[(key, text)] += 1
+        memo_key = (scope, key, text)
+        if memo_key not in self.ids:
+            self.ids[memo_key] = humidify(text, key=key)
+        return self.ids[memo_key]
+
+    def add(self, counts):
+        """Add lookups counted while extracting a text elsewhere"""
+        self.counts.setdefault(None, Counter()).update(counts)
+
+    @property
+    def lookups(self):
+        """Total lookups so far, and distinct strings looked up"""
+        total = sum(sum(x.values()) for x in self.counts.values())
+        return total, len(set().union(*self.counts.values()))
+
+
+id_memo = IDMemo()  # used for all conversions run by this process
+
+
+def set_id_scope(scope):
+    """Mark the IDs handed out from now on as belonging to the form slices of <scope>"""
+    if isinstance(humidifier.og_humidifier, IDRecorder):
+        humidifier.og_humidifier.scope = scope
+
+
+def iter_texts(flextext_file):
+    """Parse the interlinear texts in a .flextext file one by one"""
+    for fragment in iter_xml_fragments(flextext_file, "interlinear-text"):
+        yield parse_fragment(fragment, "interlinear-text")
+
+
+def expand_flextext_paths(paths):
+    """Expand a path or a list of paths, which can be files, directories, or
+    glob patterns, into a list of .flextext files, which may be empty. Files
+    in directories and files matching a pattern are sorted by name."""
+    if isinstance(paths, (str, Path)):
+        paths = [paths]
+    flextext_files = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            flextext_files.extend(sorted(path.glob("*.flextext")))
+        elif path.is_file():
+            flextext_files.append(path)
+        else:
+            flextext_files.extend(Path(x) for x in sorted(glob.glob(str(path))))
+    return deduplicate(flextext_files)
+
+
+def find_flextext_files(paths):
+    """Like expand_flextext_paths, but exit if there are no .flextext files"""
+    flextext_files = expand_flextext_paths(paths)
+    if not flextext_files:
+        if isinstance(paths, (str, Path)):
+            paths = [paths]
+        log.error(f"No .flextext files found in {', '.join(map(str, paths))}")
+        sys.exit()
+    return flextext_files
+
+
+def iter_flextext_fragments(flextext_files):
+    """Yield the serialized interlinear texts of several .flextext files"""
+    for flextext_file in flextext_files:
+        log.info(f"Reading {flextext_file.resolve()}...")
+        yield from iter_xml_fragments(flextext_file, "interlinear-text")
+
 
 def compose_surface_string(entries):
     # combine surface words and punctuation into one string
     return "".join(w if set(w) <= punc else " " + w for w in entries).lstrip()
 
 
+def join_interlinear_lines(lines, fix_clitics=True):
+    """Join the word-level fields of a phrase into tab-separated lines,
+    in order of first appearance"""
+    columns = dict.fromkeys(chain.from_iterable(lines))
+    columns.pop("morph_type", None)
+    joined = {}
+    for col in columns:
+        joined[col] = "\t".join(line.get(col, "") for line in lines)
+        if fix_clitics:
+            joined[col] = joined[col].replace("\t=", "=").replace("=\t", "=")
+    return joined
+
+
 def init_word_dict(word, obj_key, punct_key, surface):
     """Create a dict containing the word-specific fields"""
     word_dict = {"morph_type": []}
@@ -126,44 +305,50 @@ def iterate_morphemes(word, word_dict, obj_key, gloss_key, conf, p=False):
 
 
 def id_glosses(gloss, sep=None):
-    res = [humidify(g, key="glosses") for g in re.split(r"\.\b", gloss)]
+    res = [id_memo.humidify(g, "glosses") for g in gloss_pattern.split(gloss)]
     if sep:
         return sep.join(res)
     return res
 
 
 def get_form_slices(
-    word_dict, word_id, lexicon, form_slices, obj_key, gloss_key, ex_id, retriever
+    word_dict,
+    word_id,
+    lexicon,
+    form_slices,
+    obj_key,
+    gloss_key,
+    ex_id,
+    retriever,
+    tokenizer=None,
 ):  # pylint: disable=too-many-arguments
     """For a given word consisting of a number of morphemes, establish what morphemes occur in which position, based on the lexicon information"""
     if word_id not in form_slices:
         form_slices[word_id] = []
+        set_id_scope(word_id)
+        tokenizer = tokenizer or get_tokenizer()
+        form = tokenizer.strip(word_dict[obj_key])
+        form_meaning = None
         for m_c, (morph_obj, morph_gloss, morph_type) in enumerate(
             zip(
-                re.split(re.compile("|".join(delimiters)), word_dict[obj_key]),
-                re.split(re.compile("|".join(delimiters)), word_dict[gloss_key]),
+                tokenizer.split(word_dict[obj_key]),
+                tokenizer.split(word_dict[gloss_key]),
                 word_dict["morph_type"],
             )
         ):
             if morph_gloss:
-                m_id, sense_id = retriever.retrieve_morph_id(
-                    morph_obj,
-                    morph_gloss,
-                    morph_type,
-                    sense_key="Parameter_ID",
-                    form_key="Form_Bare",
-                )
+                m_id, sense_id = retriever.retrieve(morph_obj, morph_gloss, morph_type)
                 if m_id:
+                    if form_meaning is None:
+                        form_meaning = id_memo.humidify(
+                            word_dict[gloss_key].strip("="), "meanings"
+                        )
                     form_slices[word_id].append(
                         {
                             "ID": f"{word_id}-{str(m_c)}",
                             "Wordform_ID": word_id,
-                            "Form": re.sub(
-                                "|".join(delimiters), "", word_dict[obj_key]
-                            ),
-                            "Form_Meaning": humidify(
-                                word_dict[gloss_key].strip("="), key="meanings"
-                            ),
+                            "Form": form,
+                            "Form_Meaning": form_meaning,
                             "Morph_ID": m_id,
                             "Morpheme_Meaning": sense_id,
                             "Index": str(m_c),
@@ -172,6 +357,7 @@ def get_form_slices(
                     )
             else:
                 log.warning(f"Unglossed morpheme /{morph_obj}/ in {ex_id}")
+        set_id_scope(None)
 
 
 def process_clitic_slices(clitic, sentence_slices, gloss_key, word_count, ex_id):
@@ -182,8 +368,8 @@ def process_clitic_slices(clitic, sentence_slices, gloss_key, word_count, ex_id)
             "Wordform_ID": clitic["Clitic_ID"],
             "Index": word_count,
             "Form_Meaning": clitic.get(gloss_key, "***"),
-            "Parameter_ID": humidify(
-                clitic.get(gloss_key, "***").strip("="), key="meanings"
+            "Parameter_ID": id_memo.humidify(
+                clitic.get(gloss_key, "***").strip("="), "meanings"
             ),
         }
     )
@@ -199,7 +385,6 @@ def add_clitic_wordforms(wordforms, clitic, obj_key, gloss_key):
         wordforms[clitic["Clitic_ID"]]["Form"].append(clitic[obj_key])
     if clitic[gloss_key].strip("=") not in wordforms[clitic["Clitic_ID"]]["Meaning"]:
         wordforms[clitic["Clitic_ID"]]["Meaning"].append(clitic[gloss_key].strip("="))
-        humidify(clitic[gloss_key].strip("="), key="meanings")
 
 
 def extract_records(  # noqa: MC0001
@@ -213,10 +398,12 @@ def extract_records(  # noqa: MC0001
     form_slices,
     lexicon,
     conf,
+    retriever=None,
 ):  # pylint: disable=too-many-locals,too-many-arguments
     record_list = []
-    if lexicon is not None:
-        retriever = Morphinder(lexicon)
+    tokenizer = get_tokenizer(conf)
+    if lexicon is not None and retriever is None:
+        retriever = MorphRetriever(lexicon)
     if text.find("phrase"):
         iterator = "phrase"
     else:
@@ -255,6 +442,7 @@ def extract_records(  # noqa: MC0001
                         gloss_key,
                         ex_id,
                         retriever,
+                        tokenizer,
                     )
                     for clitic in proclitics + enclitics:
                         get_form_slices(
@@ -266,6 +454,7 @@ def extract_records(  # noqa: MC0001
                             gloss_key,
                             ex_id,
                             retriever,
+                            tokenizer,
                         )
 
                 for clitic in proclitics:
@@ -277,7 +466,7 @@ def extract_records(  # noqa: MC0001
                     interlinear_lines.append(clitic)
 
                 form_meaning = word_dict.get(gloss_key, "***").strip("=")
-                form_meaning_id = humidify(form_meaning, key="meanings")
+                form_meaning_id = id_memo.humidify(form_meaning, "meanings")
 
                 sentence_slices.append(
                     {
@@ -314,9 +503,6 @@ def extract_records(  # noqa: MC0001
                     del clitic["Clitic_ID"]
                     interlinear_lines.append(clitic)
         surface = compose_surface_string(surface)
-        interlinear_lines = pd.DataFrame.from_dict(interlinear_lines).fillna("")
-        if len(interlinear_lines) != 0:
-            interlinear_lines.drop(columns=["morph_type"], inplace=True)
         phrase_dict = {
             "ID": ex_id,
             "Primary_Text": surface,
@@ -328,41 +514,300 @@ def extract_records(  # noqa: MC0001
             phrase_dict[
                 phrase_item["type"] + "_" + phrase_item["lang"] + "_phrase"
             ] = phrase_item.text
-        for col in interlinear_lines.columns:
-            if conf.get("fix_clitics", True):
-                phrase_dict[col] = (
-                    "\t".join(
-                        interlinear_lines[
-                            col
-                        ]  # pylint: disable=unsubscriptable-object 🙄
-                    )
-                    .replace("\t=", "=")
-                    .replace("=\t", "=")
-                )
-            else:
-                phrase_dict[col] = "\t".join(
-                    interlinear_lines[col]  # pylint: disable=unsubscriptable-object 🙄
-                )
+        phrase_dict.update(
+            join_interlinear_lines(
+                interlinear_lines, fix_clitics=conf.get("fix_clitics", True)
+            )
+        )
         record_list.append(phrase_dict)
     return record_list
 
 
-def load_lexicon(lexicon_file, conf, sep, output_dir="."):
+def extract_text(fragment, **kwargs):
+    """Extract a serialized interlinear text without touching the humidifier registry.
+    Returns all extracted data, with IDs as placeholders"""
+    registry = humidifier.og_humidifier
+    humidifier.og_humidifier = recorder = IDRecorder()
+    retriever = kwargs.get("retriever")
+    lookups = retriever.lookups if retriever else (0, 0)
+    id_counts, id_memo.counts = id_memo.counts, {}
+    try:
+        text = parse_fragment(fragment, "interlinear-text")
+        text_id = get_text_id(text)
+        result = {
+            "text": get_text_metadata(text, text_id),
+            "wordforms": {},
+            "sentence_slices": [],
+            "form_slices": {},
+        }
+        result["records"] = extract_records(
+            text,
+            text_id=text_id,
+            wordforms=result["wordforms"],
+            sentence_slices=result["sentence_slices"],
+            form_slices=result["form_slices"],
+            **kwargs,
+        )
+    finally:
+        humidifier.og_humidifier = registry
+        result_counts, id_memo.counts = id_memo.counts, id_counts
+    result["calls"] = recorder.calls
+    if retriever:
+        result["lookups"] = tuple(x - y for x, y in zip(retriever.lookups, lookups))
+    else:
+        result["lookups"] = lookups
+    result["id_lookups"] = result_counts
+    return result
+
+
+worker_args = {}
+
+
+def init_worker(kwargs):
+    worker_args.update(kwargs)
+    if kwargs["lexicon"] is not None:
+        worker_args["retriever"] = MorphRetriever(kwargs["lexicon"])
+
+
+def process_text(fragment):
+    return extract_text(fragment, **worker_args)
+
+
+def fill_ids(value, ids):
+    """Replace ID placeholders in (nested) extracted data"""
+    if isinstance(value, str):
+        if "\x00" not in value:
+            return value
+        return id_placeholder.sub(lambda x: ids[int(x.group(1))], value)
+    if isinstance(value, list):
+        return [fill_ids(x, ids) for x in value]
+    if isinstance(value, dict):
+        return {fill_ids(k, ids): fill_ids(v, ids) for k, v in value.items()}
+    return value
+
+
+def merge_text(
+    result, text_list, record_list, wordforms, sentence_slices, form_slices
+):  # pylint: disable=too-many-arguments
+    """Assign the IDs recorded in a worker process, in the same order as a serial
+    run would, and add the extracted data of the text to the collected data"""
+    ids = []
+    for scope, text, key, unique in result["calls"]:
+        if scope is not None and fill_ids(scope, ids) in form_slices:
+            ids.append(None)  # the form slices of this word are already known
+        else:
+            ids.append(humidify(fill_ids(text, ids), key=key, unique=unique))
+    # a serial run only looks up the IDs in the form slices of new words; a
+    # clitic can have several placeholders in one text
+    scopes = set()
+    for scope, counts in result["id_lookups"].items():
+        if scope is not None:
+            scope = fill_ids(scope, ids)
+            if scope in form_slices or scope in scopes:
+                continue
+            scopes.add(scope)
+        id_memo.add(counts)
+    result = fill_ids(result, ids)
+    text_list.append(result["text"])
+    record_list.extend(result["records"])
+    sentence_slices.extend(result["sentence_slices"])
+    for word_id, slices in result["form_slices"].items():
+        form_slices.setdefault(word_id, slices)
+    for word_id, wordform in result["wordforms"].items():
+        if word_id not in wordforms:
+            wordforms[word_id] = wordform
+            continue
+        for label in ["Form", "Meaning"]:
+            for value in wordform[label]:
+                if value not in wordforms[word_id][label]:
+                    wordforms[word_id][label].append(value)
+
+
+def dump_pickle(obj, path):
+    """Pickle to a temporary file next to path and move it into place, so that
+    an interrupted run does not leave a truncated file behind"""
+    path = Path(path)
+    with tempfile.NamedTemporaryFile(
+        "wb", dir=path.parent, suffix=".tmp", delete=False
+    ) as f:
+        try:
+            pickle.dump(obj, f)
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    os.replace(f.name, path)
+
+
+def load_pickle(path):
+    """Unpickle a cache file; unreadable files are deleted and None is returned"""
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        # truncated files, or ones pickled with other versions of dependencies
+        log.warning(f"Ignoring unreadable cache file {path}: {e!r}")
+        Path(path).unlink(missing_ok=True)
+        return None
+
+
+class TextCache:
+    """Extracted texts stored on disk, keyed by a hash of the text's XML and
+    <base_key>, a hash of everything else the extraction depends on"""
+
+    def __init__(self, directory, base_key):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.base_key = base_key
+        self.used = set()
+        self.hits = 0
+
+    def key(self, fragment):
+        key = hashlib.sha256((self.base_key + fragment).encode("utf-8")).hexdigest()
+        self.used.add(key)
+        return key
+
+    def path(self, fragment):
+        return self.directory / f"{self.key(fragment)}.pickle"
+
+    def get(self, fragment):
+        path = self.path(fragment)
+        if not path.is_file():
+            return None
+        result = load_pickle(path)
+        if result is not None:
+            self.hits += 1
+        return result
+
+    def put(self, fragment, result):
+        dump_pickle(result, self.path(fragment))
+
+    def prune(self):
+        """Remove entries not used since the cache was opened, and leftovers
+        of interrupted writes"""
+        for path in self.directory.glob("*.pickle"):
+            if path.stem not in self.used:
+                path.unlink()
+        for path in self.directory.glob("*.tmp"):
+            path.unlink()
+
+
+class MemoryTextCache(TextCache):
+    """A TextCache stored in a dict instead of a directory"""
+
+    def __init__(self, results, base_key):  # pylint: disable=super-init-not-called
+        self.results = results
+        self.base_key = base_key
+        self.used = set()
+        self.hits = 0
+
+    def get(self, fragment):
+        result = self.results.get(self.key(fragment))
+        if result is not None:
+            self.hits += 1
+        return result
+
+    def put(self, fragment, result):
+        self.results[self.key(fragment)] = result
+
+    def prune(self):
+        for key in list(self.results):
+            if key not in self.used:
+                del self.results[key]
+
+
+class MemoryCache:
+    """The processed lexicon, the morph retriever, and extracted texts, kept
+    in memory between the conversions run by one process (see cldflex.watch).
+    Like the --cache directory, entries are only used if the lexicon,
+    configuration and texts have not changed."""
+
+    def __init__(self):
+        self.lexicon_key = None
+        self.lexicon = None  # pickled, as the tables are modified by convert()
+        self.retriever = None
+        self.texts = {}
+
+    def get_lexicon(self, key):
+        if key != self.lexicon_key:
+            return None
+        return pickle.loads(self.lexicon)
+
+    def put_lexicon(self, key, tables):
+        self.lexicon_key = key
+        self.lexicon = pickle.dumps(tables)
+        self.retriever = None
+
+
+def process_texts(fragments, jobs=1, cache=None, retriever=None, **kwargs):
+    """Extract serialized texts in <jobs> worker processes, or from the cache,
+    and yield the results in order. Worker processes use their own retrievers."""
+    pool = Pool(jobs, initializer=init_worker, initargs=(kwargs,)) if jobs > 1 else None
+    try:
+        while True:
+            batch = list(islice(fragments, max(jobs, 1) * 8))
+            if not batch:
+                break
+            results = [cache.get(x) if cache else None for x in batch]
+            todo = [x for x, result in zip(batch, results) if result is None]
+            if pool:
+                extracted = pool.imap(process_text, todo)
+            else:
+                extracted = (
+                    extract_text(x, retriever=retriever, **kwargs) for x in todo
+                )
+            for fragment, result in zip(batch, results):
+                if result is None:
+                    result = next(extracted)
+                    if cache:
+                        cache.put(fragment, result)
+                else:
+                    result["lookups"] = (0, 0)
+                yield result
+    finally:
+        if pool:
+            pool.terminate()
+
+
+def load_lexicon(
+    lexicon_file,
+    conf,
+    sep,
+    output_dir=".",
+    cache_dir=None,
+    cache_key=None,
+    table_format="csv",
+):  # pylint: disable=too-many-arguments
     if lexicon_file is None:
         log.warning(
             "No lexicon file provided. If you want the output to contain morph IDs, provide a csv file with ID, Form, and Meaning."
         )
         return None
+    if cache_dir:
+        cache_path = Path(cache_dir) / f"lexicon-{cache_key}.pickle"
+        if cache_path.is_file():
+            tables = load_pickle(cache_path)
+            if tables is not None:
+                log.info(f"Lexicon {lexicon_file} has not changed, using {cache_path}")
+                return tables
     lexemes, stems, morphemes, morphs, senses = lift2csv(
-        lift_file=lexicon_file, output_dir=output_dir, conf=conf
+        lift_file=lexicon_file,
+        output_dir=output_dir,
+        conf=conf,
+        table_format=table_format,
     )
-    morphs["Form_Bare"] = morphs["Form"].apply(
-        lambda x: re.sub(re.compile("|".join(delimiters)), "", x)
+    morphs["Form_Bare"] = morphs["Form"].str.replace(
+        get_tokenizer(conf).pattern, "", regex=True
     )
+    if cache_dir:
+        for path in Path(cache_dir).glob("lexicon-*.pickle"):
+            path.unlink()
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        dump_pickle((lexemes, stems, morphemes, morphs, senses), cache_path)
     return lexemes, stems, morphemes, morphs, senses
 
 
-def load_keys(conf, texts):
+def load_keys(conf, text):
     if "gloss_lg" not in conf:
         log.info("Unconfigured: gloss_lg, assuming [en].")
         conf["gloss_lg"] = "en"
@@ -372,7 +817,7 @@ def load_keys(conf, texts):
     gloss_key = "gls_" + conf["gloss_lg"]
 
     if "obj_lg" not in conf:
-        conf["obj_lg"] = texts.find_all("item", lang=lambda x: x != conf["gloss_lg"])[
+        conf["obj_lg"] = text.find_all("item", lang=lambda x: x != conf["gloss_lg"])[
             0
         ]["lang"]
         log.info(f"Unconfigured: obj_lg, assuming [{conf['obj_lg']}].")
@@ -391,7 +836,7 @@ def get_text_id(text):
     for abbrev in abbrevs:
         if abbrev.text != "" and text_id is None:
             text_id = humidify(abbrev.text, key="texts", unique=True)
-            log.info(f"Processing text {text_id} ({abbrev['lang']})")
+            log.info(f"Processing text {abbrev.text} ({abbrev['lang']})")
     return text_id
 
 
@@ -403,18 +848,23 @@ def get_text_metadata(text, text_id):
     return text_metadata
 
 
-def split_subrecords(rec):
-    if "." in rec["Sentence_Number"]:
-        rec["Sentence_Number"], rec["Phrase_Number"] = rec["Sentence_Number"].split(".")
-    return rec
-
-
-def strip_form(form):
-    return re.sub(re.compile("|".join(delimiters + ["Ø"])), "", form)
+def split_subrecords(df):
+    """Split sentence numbers like 4.2 into sentence and phrase numbers"""
+    if "Sentence_Number" not in df.columns:
+        return df
+    numbers = df["Sentence_Number"].str.split(".", n=1, expand=True)
+    if numbers.shape[1] > 1:
+        df["Sentence_Number"] = numbers[0]
+        df["Phrase_Number"] = numbers[1]
+        # when only some records have phrase numbers, the columns have always
+        # been in alphabetical order
+        if numbers[1].isna().any():
+            df = df[sorted(df.columns)]
+    return df
 
 
 def prepare_records(df, conf):
-    rename_dict = conf.get("mappings", {})
+    rename_dict = dict(conf.get("mappings", {}))
     for gen_col, label in [
         (f"gls_{conf['gloss_lg']}_phrase", "Translated_Text"),
         (f"pos_{conf['gloss_lg']}_word", "Part_Of_Speech"),
@@ -432,7 +882,7 @@ def prepare_records(df, conf):
         df[v] = df[k]
     df["Language_ID"] = conf["lang_id"]
     # resolve records with multiple phrases
-    df = df.apply(lambda x: split_subrecords(x), axis=1)
+    df = split_subrecords(df)
     sort_order = [
         "ID",
         "Primary_Text",
@@ -459,82 +909,185 @@ def convert(
     output_dir=None,
     cldf=False,
     audio_folder=None,
+    jobs=1,
+    cache=False,
+    validation=None,
+    table_format="csv",
 ):  # pylint: disable=too-many-locals,too-many-arguments
+    require_arrow(table_format)
     output_dir = output_dir or Path(".")
-    flextext_file = Path(flextext_file)
-    log.info(f"Reading {flextext_file.resolve()}...")
-    with open(flextext_file, "r", encoding="utf-8") as f:
-        texts = BeautifulSoup(f.read(), features="xml")
+    # one or more files, which are converted as one corpus
+    flextext_files = find_flextext_files(flextext_file)
+    fragments = timed(iter_flextext_fragments(flextext_files), "parse")
+    # the first text is used for guessing unconfigured languages
+    first_fragment = next(fragments, None)
+    if first_fragment:
+        fragments = chain([first_fragment], fragments)
+        with stage("parse"):
+            first_text = parse_fragment(first_fragment, "interlinear-text")
+    else:
+        first_text = None
 
     if not conf:
         log.info(
             "Running in unconfigured mode. Create a cldflex.yaml file, point to another --conf file, or pass in a conf dict to modify parameters."
         )
         conf = {}
-    obj_key, gloss_key, punct_key = load_keys(conf, texts)
+    obj_key, gloss_key, punct_key = load_keys(conf, first_text)
     sep = conf.get("csv_cell_separator", SEPARATOR)
 
-    if lexicon_file:
-        lexemes, stems, morphemes, lexicon, senses = load_lexicon(
-            lexicon_file, conf, sep, output_dir
+    if cache:
+        cache_key = hash_values(
+            version("cldflex"),
+            # the lexicon is cached as pickled dataframes
+            version("pandas"),
+            {k: v for k, v in conf.items() if k != "cldf"},
+            file_hash(lexicon_file) if lexicon_file else None,
+            table_format,
         )
+    else:
+        cache_key = None
+    memory = cache if isinstance(cache, MemoryCache) else None
+    if cache and not memory:
+        cache_dir = Path(output_dir) / ".cldflex-cache"
+    else:
+        cache_dir = None
+
+    if lexicon_file:
+        with stage("lexicon"):
+            lexicon_tables = memory.get_lexicon(cache_key) if memory else None
+            if lexicon_tables is None:
+                lexicon_tables = load_lexicon(
+                    lexicon_file,
+                    conf,
+                    sep,
+                    output_dir,
+                    cache_dir,
+                    cache_key,
+                    table_format,
+                )
+                if memory:
+                    memory.put_lexicon(cache_key, lexicon_tables)
+            else:
+                log.info(f"Lexicon {lexicon_file} has not changed")
+            lexemes, stems, morphemes, lexicon, senses = lexicon_tables
     else:
         lexicon = None
         stems = None
         senses = None
 
-    if lexicon is not None:
+    if memory and memory.retriever:
+        lookup_lexicon, retriever = memory.retriever
+    elif lexicon is not None:
         lookup_lexicon = lexicon.copy()
         for col in lookup_lexicon.columns:
             if isinstance(lookup_lexicon[col].iloc[0], list) and col != "Parameter_ID":
                 lookup_lexicon[col] = lookup_lexicon[col].apply(lambda x: sep.join(x))
+        retriever = MorphRetriever(lookup_lexicon)
+        if memory:
+            memory.retriever = (lookup_lexicon, retriever)
     else:
-        lookup_lexicon = None
+        lookup_lexicon = retriever = None
 
+    stats = {}
+    if len(flextext_files) > 1:
+        stats["Files"] = len(flextext_files)
+    lookups = [0, 0]
+    id_memo.reset()
     wordforms = {}
     sentence_slices = []
     form_slices = {}
     text_list = []
     record_list = []
-    for text in texts.find_all("interlinear-text"):
-        text_id = get_text_id(text)
-        text_list.append(get_text_metadata(text, text_id))
-        record_list.extend(
-            extract_records(
-                text,
-                obj_key,
-                punct_key,
-                gloss_key,
-                text_id,
-                wordforms,
-                sentence_slices,
-                form_slices,
-                lookup_lexicon,
-                conf,
-            )
+    if memory:
+        text_cache = MemoryTextCache(memory.texts, cache_key)
+    elif cache:
+        text_cache = TextCache(cache_dir / "texts", cache_key)
+    else:
+        text_cache = None
+    if jobs > 1 or text_cache:
+        with stage("extract"):
+            for result in process_texts(
+                fragments,
+                jobs,
+                cache=text_cache,
+                retriever=retriever,
+                obj_key=obj_key,
+                punct_key=punct_key,
+                gloss_key=gloss_key,
+                lexicon=lookup_lexicon,
+                conf=conf,
+            ):
+                lookups = [x + y for x, y in zip(lookups, result["lookups"])]
+                merge_text(
+                    result,
+                    text_list,
+                    record_list,
+                    wordforms,
+                    sentence_slices,
+                    form_slices,
+                )
+        if text_cache:
+            text_cache.prune()
+            log.info(f"Reused {text_cache.hits} of {len(text_list)} texts from cache")
+    else:
+        for fragment in fragments:
+            with stage("parse"):
+                text = parse_fragment(fragment, "interlinear-text")
+            with stage("extract"):
+                text_id = get_text_id(text)
+                text_list.append(get_text_metadata(text, text_id))
+                record_list.extend(
+                    extract_records(
+                        text,
+                        obj_key,
+                        punct_key,
+                        gloss_key,
+                        text_id,
+                        wordforms,
+                        sentence_slices,
+                        form_slices,
+                        lookup_lexicon,
+                        conf,
+                        retriever,
+                    )
+                )
+        if retriever:
+            lookups = list(retriever.lookups)
+    if retriever:
+        stats["Morph lookups"] = (
+            f"{sum(lookups)} ({lookups[0]} memoized, {lookups[1]} searched in lexicon)"
+        )
+    id_lookups = id_memo.lookups
+    if id_lookups[0]:
+        stats["Gloss and meaning IDs"] = (
+            f"{id_lookups[0]} lookups ({id_lookups[1]} distinct)"
         )
 
-    df = (
-        pd.DataFrame.from_dict(record_list)
-        .rename(columns={obj_key: "Analyzed_Word", gloss_key: "Gloss"})
-        .fillna("")
-    )
-    records = prepare_records(df, conf)
-    wordforms = pd.DataFrame.from_dict(wordforms.values())
-    texts = pd.DataFrame.from_dict(text_list)
-    texts.rename(columns={"title_" + conf["gloss_lg"]: "Name"}, inplace=True)
-    form_slices = pd.DataFrame.from_dict(chain(*form_slices.values()))
-    tables = {
-        "wordforms": wordforms,
-        "examples": records,
-        "texts": texts,
-    }
-    if len(form_slices) > 0:
-        tables["wordformparts"] = form_slices
-
-    if conf.get("sentence_slices", True):
-        sentence_slices = pd.DataFrame.from_dict(sentence_slices)
-        tables["exampleparts"] = sentence_slices
+    with stage("prepare"):
+        df = (
+            pd.DataFrame.from_dict(record_list)
+            .rename(columns={obj_key: "Analyzed_Word", gloss_key: "Gloss"})
+            .fillna("")
+        )
+        with stage("examples") as timing:
+            records = prepare_records(df, conf)
+        stats["Preparing examples"] = f"{timing['wall_time']:.3f}s"
+        wordforms = pd.DataFrame.from_dict(wordforms.values())
+        texts = pd.DataFrame.from_dict(text_list)
+        texts.rename(columns={"title_" + conf["gloss_lg"]: "Name"}, inplace=True)
+        form_slices = pd.DataFrame.from_dict(chain(*form_slices.values()))
+        tables = {
+            "wordforms": wordforms,
+            "examples": records,
+            "texts": texts,
+        }
+        if len(form_slices) > 0:
+            tables["wordformparts"] = form_slices
+
+        if conf.get("sentence_slices", True):
+            sentence_slices = pd.DataFrame.from_dict(sentence_slices)
+            tables["exampleparts"] = sentence_slices
 
     if cldf:
         if audio_folder:
@@ -556,7 +1109,7 @@ def convert(
 
         if stems is not None:
             stems["Gloss_ID"] = stems["Gloss"].apply(
-                lambda x: [humidify(x, key="glosses")]
+                lambda x: [id_memo.humidify(x, "glosses")]
             )
 
         glosses = get_values("glosses")
@@ -569,7 +1122,9 @@ def convert(
         tables["wordforms"]["Morpho_Segments"] = tables["wordforms"]["Form"].apply(
             lambda x: x.split("-")
         )
-        tables["wordforms"]["Form"] = tables["wordforms"]["Form"].apply(strip_form)
+        tables["wordforms"]["Form"] = tables["wordforms"]["Form"].str.replace(
+            get_tokenizer(conf).zero_pattern, "", regex=True
+        )
         tables["wordforms"]["Description"] = tables["wordforms"]["Meaning"]
 
         contributors = cldf_settings.get("contributors", {})
@@ -612,18 +1167,24 @@ def convert(
             iso = conf["lang_id"]
         else:
             iso = None
-        create_corpus_dataset(
-            tables=tables,
-            glottocode=glottocode,
-            iso=iso,
-            metadata=metadata,
-            output_dir=output_dir,
-            cwd=flextext_file.parents[0],
-            sep=sep,
-        )
+        with stage("cldf"):
+            # pylint: disable-next=import-outside-toplevel
+            from cldflex.cldf import create_corpus_dataset, get_validation
+
+            create_corpus_dataset(
+                tables=tables,
+                glottocode=glottocode,
+                iso=iso,
+                metadata=metadata,
+                output_dir=output_dir,
+                cwd=flextext_files[0].parents[0],
+                sep=sep,
+                **get_validation(cldf_settings, validation),
+            )
 
-    for name, df in tables.items():
-        df = delistify(df, sep)
-        if output_dir:
-            dump(df, output_dir / f"{name}.csv")
+    with stage("csv"):
+        for name, df in tables.items():
+            if output_dir:
+                write_table(df, output_dir, name, sep, table_format)
+    report_stats(stats)
     return tables
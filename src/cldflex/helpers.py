@@ -1,12 +1,65 @@
+import hashlib
+import json
 import logging
+import re
+import sys
+from functools import lru_cache
+from pathlib import Path
+from xml.etree import ElementTree
 
+import numpy as np
 import pandas as pd
+from bs4 import BeautifulSoup
+from pandas.api.types import infer_dtype, is_object_dtype
 from slugify import slugify
+from writio import dump
+
+from cldflex import TABLE_FORMATS
+from cldflex.sqlite import (
+    DATABASE,
+    has_sqlite_table,
+    read_sqlite_table,
+    write_sqlite_table,
+)
 
 log = logging.getLogger(__name__)
 
 
-empty_slugs = {}
+SLUG_CACHE_SIZE = 2**14
+
+empty_slugs = {}  # strings without a slug and their null-N names
+
+DELIMITERS = ["-", "<", ">", "~"]
+
+
+class MorphemeTokenizer:
+    """Splits forms and glosses into morphemes, using compiled delimiter patterns"""
+
+    def __init__(self, delimiters=None):
+        self.delimiters = list(delimiters or DELIMITERS)
+        self.pattern = re.compile("|".join(map(re.escape, self.delimiters)))
+        self.zero_pattern = re.compile(
+            "|".join(map(re.escape, self.delimiters + ["Ø"]))
+        )
+
+    def split(self, string):
+        return self.pattern.split(string)
+
+    def strip(self, string, zero=False):
+        """Remove delimiters (and zero morphs) from a string"""
+        if zero:
+            return self.zero_pattern.sub("", string)
+        return self.pattern.sub("", string)
+
+
+@lru_cache(maxsize=None)
+def _get_tokenizer(delimiters):
+    return MorphemeTokenizer(delimiters)
+
+
+def get_tokenizer(conf=None):
+    """Get the tokenizer for the morpheme_delimiters specified in conf"""
+    return _get_tokenizer(tuple((conf or {}).get("morpheme_delimiters", DELIMITERS)))
 
 
 def add_to_list_in_dict(dic, key, value):
@@ -14,36 +67,190 @@ def add_to_list_in_dict(dic, key, value):
     dic[key].append(value)
 
 
+@lru_cache(maxsize=SLUG_CACHE_SIZE)
+def _slugify(string):
+    return slugify(string)
+
+
 def slug(string):
-    if slugify(string) != "":
-        return slugify(string)
-    if string in empty_slugs:
-        return empty_slugs[string]
-    c = 0
-    test_string = f"null-{c}"
-    while test_string in empty_slugs.values():
-        c += 1
-        test_string = f"null-{c}"
-    empty_slugs[string] = test_string
-    return test_string
+    """Slugify a string. Strings with an empty slug, like those in scripts
+    without a transliteration, are named null-0, null-1, ... in the order in
+    which they are first seen."""
+    res = _slugify(string)
+    if res:
+        return res
+    if string not in empty_slugs:
+        # names are never taken back, so the next free number is the count
+        empty_slugs[string] = f"null-{len(empty_slugs)}"
+    return empty_slugs[string]
+
+
+def reset_slugs():
+    """Forget the null-N names handed out so far, e.g. before a conversion"""
+    empty_slugs.clear()
+
+
+def file_hash(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def hash_values(*values):
+    """Get a stable hash of JSON-serializable values"""
+    return hashlib.sha256(
+        json.dumps(values, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def report_stats(stats):
+    """Log a summary of a conversion run"""
+    if not stats:
+        return
+    log.info(
+        "Summary:\n" + "\n".join(f"* {label}: {value}" for label, value in stats.items())
+    )
 
 
 def deduplicate(unreliable_list):
     return list(dict.fromkeys(unreliable_list))
 
 
+def list_columns(df):
+    """Get the names of columns containing lists"""
+    res = []
+    for col in df.columns:
+        values = df[col]
+        # columns with only strings, numbers, or NaN are ruled out without
+        # going through the cells in python
+        if not is_object_dtype(values) or not infer_dtype(
+            values, skipna=True
+        ).startswith("mixed"):
+            continue
+        if any(isinstance(x, list) for x in values.values):
+            res.append(col)
+    return res
+
+
 def delistify(df, sep):
     with pd.option_context("mode.chained_assignment", None):
-        for col in df.columns:
-            test_df = df[df[col].apply(lambda x: isinstance(x, list))]
-            if len(test_df) == 0:
-                continue
-            df[col] = df[col].fillna("").apply(list)
-            df[col] = df[col].apply(sep.join)
+        for col in list_columns(df):
+            df[col] = df[col].str.join(sep).fillna("")
     return df
 
 
 def listify(df, column, sep):
-    if not isinstance(df[column].iloc[0], list):
-        df[column] = df[column].apply(lambda x: x.split(sep))
+    if len(df) > 0 and not isinstance(df[column].iloc[0], list):
+        df[column] = df[column].str.split(sep, regex=False)
     return df
+
+
+def require_arrow(table_format):
+    """Exit if a table format needs pyarrow and it is not installed"""
+    if table_format in ["csv", "sqlite"]:
+        return
+    try:
+        import pyarrow  # noqa: F401 pylint: disable=import-outside-toplevel,unused-import
+    except ImportError:
+        log.error(
+            f"Writing {table_format} files requires pyarrow:\n\tpip install cldflex[arrow]"
+        )
+        sys.exit()
+
+
+def arrow_safe(df):
+    """Prepare a dataframe for Arrow: list columns only contain lists, and
+    other columns with mixed values are converted to strings"""
+    lists = list_columns(df)
+    columns = {}
+    for col in df.columns:
+        if col in lists:
+            columns[col] = df[col].map(
+                lambda x: x
+                if isinstance(x, list)
+                else []
+                if pd.isna(x) or x == ""
+                else [x]
+            )
+        elif is_object_dtype(df[col]) and infer_dtype(df[col], skipna=True).startswith(
+            "mixed"
+        ):
+            columns[col] = df[col].map(lambda x: "" if pd.isna(x) else str(x))
+    return df.assign(**columns)
+
+
+def write_table(df, output_dir, name, sep, table_format="csv"):
+    """Write a table as CSV, with lists joined by sep, as a Parquet or
+    Feather file, with native list columns, or to the SQLite database in
+    output_dir, with lists joined by sep"""
+    path = Path(output_dir) / f"{name}.{table_format}"
+    if table_format == "csv":
+        dump(delistify(df, sep), path)
+    elif table_format == "sqlite":
+        write_sqlite_table(delistify(df, sep), Path(output_dir) / DATABASE, name)
+    elif table_format == "parquet":
+        arrow_safe(df).to_parquet(path, index=False)
+    elif table_format == "feather":
+        arrow_safe(df).reset_index(drop=True).to_feather(path)
+    else:
+        raise ValueError(table_format)
+
+
+def find_table(directory, name):
+    """The path to a file containing a table written by write_table in any
+    format, if there is one"""
+    for table_format in TABLE_FORMATS:
+        if table_format == "sqlite":
+            path = Path(directory) / DATABASE
+            if has_sqlite_table(path, name):
+                return path
+            continue
+        path = Path(directory) / f"{name}.{table_format}"
+        if path.is_file():
+            return path
+    return None
+
+
+def read_table(path, name):
+    """Read a table written by write_table; all CSV values are strings"""
+    path = Path(path)
+    if path.suffix == ".csv":
+        return pd.read_csv(path, dtype=str, keep_default_na=False)
+    if path.suffix == ".sqlite":
+        return read_sqlite_table(path, name).fillna("")
+    if path.suffix == ".parquet":
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_feather(path)
+    # list columns are read as numpy arrays
+    for col in df.columns:
+        if is_object_dtype(df[col]) and any(
+            isinstance(x, np.ndarray) for x in df[col].values
+        ):
+            df[col] = df[col].map(lambda x: list(x) if isinstance(x, np.ndarray) else x)
+    return df
+
+
+def iter_xml_fragments(xml_file, tag):
+    """Yield every <tag> element of an XML file as a serialized string.
+    The file is parsed incrementally and elements are discarded once yielded,
+    so memory use is bounded by the largest element, not the file."""
+    ancestors = []
+    for event, elem in ElementTree.iterparse(xml_file, events=("start", "end")):
+        if event == "start":
+            ancestors.append(elem)
+            continue
+        ancestors.pop()
+        if elem.tag != tag:
+            continue
+        yield ElementTree.tostring(elem, encoding="unicode")
+        if ancestors:
+            ancestors[-1].remove(elem)
+        elem.clear()
+
+
+def parse_fragment(fragment, tag):
+    """Turn a string created by iter_xml_fragments into a BeautifulSoup tag"""
+    return BeautifulSoup(fragment, features="xml").find(tag)
@@ -1,26 +1,38 @@
 import logging
 import re
 import sys
-from pathlib import Path
+from itertools import chain
 
 import numpy as np
 import pandas as pd
 import yaml
-from bs4 import BeautifulSoup
-from slugify import slugify
-from writio import dump
 
 from cldflex import SEPARATOR
-from cldflex.cldf import (
-    create_corpus_dataset,
-    create_dictionary_dataset,
-    create_wordlist_dataset,
+from cldflex.helpers import (
+    add_to_list_in_dict,
+    deduplicate,
+    delistify,
+    find_table,
+    iter_xml_fragments,
+    listify,
+    parse_fragment,
+    read_table,
+    require_arrow,
+    reset_slugs,
+    slug,
+    write_table,
 )
-from cldflex.helpers import add_to_list_in_dict, deduplicate, delistify, listify
+from cldflex.profiling import stage
 
 log = logging.getLogger(__name__)
 
 
+def iter_entries(lift_file):
+    """Parse the entries in a .lift file one by one"""
+    for fragment in iter_xml_fragments(lift_file, "entry"):
+        yield parse_fragment(fragment, "entry")
+
+
 # method for getting dictionary examples from entries
 def extract_examples(sense, dictionary_examples, sense_id):
     for ex_count, example in enumerate(sense.find_all("example")):
@@ -36,7 +48,7 @@ def extract_examples(sense, dictionary_examples, sense_id):
                 child_form = child.find("form")
                 if child_form:
                     example_dict[
-                        f"{child.name}-{slugify(child['type'])}-{child_form['lang']}"
+                        f"{child.name}-{slug(child['type'])}-{child_form['lang']}"
                     ] = child_form.text
                 else:
                     log.warning(f"Sense {sense_id} has empty examples")
@@ -54,6 +66,33 @@ def figure_out_gloss_language(entry):
     return None
 
 
+def index_examples(examples, segnum_key):
+    """Map sentence numbers, text IDs and segment numbers to corpus example positions"""
+    index = {}
+    for i, ex in enumerate(examples):
+        index.setdefault(ex["Sentence_Number"], {}).setdefault(
+            ex["Text_ID"], {}
+        ).setdefault(ex.get(segnum_key), []).append(i)
+    return index
+
+
+def find_examples(index, text_id, sentence_number, segnum=None):
+    """Positions of corpus examples with the sentence number in texts whose ID
+    matches the regular expression <text_id>, optionally narrowed down to a
+    segment number"""
+    pattern = re.compile(text_id)
+    cands = []
+    for example_text_id, segnums in index.get(sentence_number, {}).items():
+        if not pattern.search(example_text_id):
+            continue
+        if segnum is None:
+            for positions in segnums.values():
+                cands.extend(positions)
+        else:
+            cands.extend(segnums.get(segnum, []))
+    return sorted(cands)
+
+
 def parse_entries(entries):
     parsed = []  # parsed entries
     senses = []  # gathered senses
@@ -73,14 +112,14 @@ def parse_entries(entries):
                 rec["form_" + form["lang"]] = form.text
         for field in entry.find_all("field", recursive=False):
             for pseudoform in field.find_all("form"):
-                rec[slugify(field["type"]) + "_" + pseudoform["lang"]] = pseudoform.text
+                rec[slug(field["type"]) + "_" + pseudoform["lang"]] = pseudoform.text
         for relation in entry.find_all("relation", recursive=False):
             if "_" not in relation["ref"]:  # ignore relations without a reference
                 continue
             for trait in relation.find_all("trait"):
                 add_to_list_in_dict(
                     rec,
-                    f"relation{relation['type']}_{trait['name']}_{slugify(trait['value'])}",
+                    f"relation{relation['type']}_{trait['name']}_{slug(trait['value'])}",
                     relation["ref"].split("_")[1],
                 )
         for sense in entry.find_all("sense", recursive=False):
@@ -121,31 +160,68 @@ def parse_entries(entries):
     return parsed, senses, dictionary_examples
 
 
+def split_into_variants(rec, abstract_key, entry_variants, main_variant=None):
+    """Yield a record for each variant of an abstract morpheme or lexeme: first
+    the entry's own form and allomorphs, then variant entries pointing to it"""
+    for idx, (form, morph_type) in enumerate(
+        zip(
+            [rec["Form"]] + rec["Variants"],
+            [rec["Type"]] + rec["variant_morph-type"],
+        )
+    ):
+        new_rec = {
+            **rec,
+            abstract_key: rec["ID"],
+            "ID": rec["ID"] + f"-{idx}",
+            "Form": form,
+            "Type": morph_type,
+        }
+        if main_variant:
+            new_rec[main_variant] = rec["ID"] + "-0"
+        yield new_rec
+    for external_variant in entry_variants.get(rec["ID"], []):
+        external_variant[abstract_key] = rec["ID"]
+        if main_variant:
+            external_variant[main_variant] = rec["ID"] + "-0"
+        yield external_variant
+
+
 def convert(
-    lift_file, output_dir=".", conf=None, cldf=False, cldf_mode=None
-):  # pylint: disable=too-many-locals
+    lift_file,
+    output_dir=".",
+    conf=None,
+    cldf=False,
+    cldf_mode=None,
+    validation=None,
+    table_format="csv",
+):  # pylint: disable=too-many-locals,too-many-arguments
     if not lift_file.suffix == ".lift":
         log.error(f"Please provide a .lift file ({lift_file}).")
         sys.exit()
+    require_arrow(table_format)
+    reset_slugs()
     sep = conf.get(
         "csv_cell_separator", SEPARATOR
     )  # separator used in cells with multiple values
 
     log.info(f"Parsing {lift_file.resolve()}")
-    with open(lift_file, "r", encoding="utf-8") as f:
-        lexicon = BeautifulSoup(f.read(), features="xml")
+    lexicon = iter_entries(lift_file)
 
     obj_lg = conf.get("obj_lg", None)  # main object language
     gloss_lg = conf.get("gloss_lg", None)  # main gloss language
 
-    for entry in lexicon.find_all(
-        "entry"
-    ):  # if not defined, they are deducted from the data
+    # if not defined, they are deducted from the first entries, which are
+    # kept around for parse_entries
+    first_entries = []
+    for entry in lexicon:
+        first_entries.append(entry)
         if not gloss_lg:
             gloss_lg = figure_out_gloss_language(entry)
             log.info(f"Unconfigured: gloss_lg, assuming {gloss_lg}")
         if not obj_lg:
             obj_lg = entry.find("form")["lang"]
+        if gloss_lg and obj_lg:
+            break
 
     obj_key = f"form_{obj_lg}"  # <form lang="X"><text>Y</text></form> becomes form_X: Y
     definition_key = f"definition_{gloss_lg}"  # <definition><form lang="X"><text>Y</text></form></definition> becomes defition_X: Y
@@ -155,32 +231,53 @@ def convert(
     var_key = "variant_" + obj_lg
 
     var_dict = {}
-    entries, senses, dictionary_examples = parse_entries(lexicon.find_all("entry"))
-    entries = pd.DataFrame.from_dict(entries)
-    senses = pd.DataFrame.from_dict(senses)
-    for key in [definition_key, gloss_key]:
-        if key not in senses.columns:
-            senses[key] = np.nan
-    # fill sense descriptions with glosses
-    senses["Description"] = senses.apply(
-        lambda x: x[definition_key]
-        if not pd.isnull(x[definition_key])
-        else x[gloss_key],
-        axis=1,
-    )
-    # fill sense names with glosses and definitions
-
-    senses = senses[~(pd.isnull(senses[gloss_key]))]
-    senses["Name"] = senses.apply(
-        lambda x: " / ".join(x[gloss_key])
-        if not pd.isnull(x[gloss_key]).all()
-        else x[definition_key],
-        axis=1,
-    )
+    with stage("parse"):
+        entries, senses, dictionary_examples = parse_entries(
+            chain(first_entries, lexicon)
+        )
+    with stage("prepare"):
+        entries = pd.DataFrame.from_dict(entries)
+        senses = pd.DataFrame.from_dict(senses)
+        for key in [definition_key, gloss_key]:
+            if key not in senses.columns:
+                senses[key] = np.nan
+        # fill sense descriptions with glosses
+        senses["Description"] = senses[definition_key].combine_first(senses[gloss_key])
+        # fill sense names with glosses and definitions
+        senses = senses[~(pd.isnull(senses[gloss_key]))]
+        names = senses[gloss_key].str.join(" / ")
+        senses["Name"] = names.where(names != "").combine_first(senses[definition_key])
+
+        entries.rename(
+            columns={
+                obj_key: "Form",
+                var_key: "Variants",
+                "Senses": "Parameter_ID",
+                gloss_key: "Gloss",
+                "morph-type": "Type",
+            },
+            inplace=True,
+        )
+        gloss_key = "Gloss"
+        entries["Variants"] = entries["Variants"].apply(
+            lambda d: d if isinstance(d, list) else []
+        )
+        entries["Language_ID"] = obj_lg
+        entries = entries.fillna("")
+
+        # listify gloss and variant columns
+        for key in [gloss_key, var_key, "variant_morph-type"]:
+            if key in entries:
+                entries[key] = entries[key].apply(
+                    lambda x: [] if not isinstance(x, list) else x
+                )
+
+    # entries by ID, for resolving variants
+    entry_index = {entry["ID"]: entry for entry in entries.to_dict("records")}
 
     # method for printing entries in log
     def entry_repr(entry_id):
-        entry = entries[entries["ID"] == entry_id].iloc[0]
+        entry = entry_index[entry_id]
         meanings = entry.get(gloss_key, entry.get(definition_key, ""))
         if not isinstance(meanings, list):
             ggg = "unknown meaning"
@@ -194,30 +291,6 @@ def convert(
             form_str = entry.get("Form", "MISSING FORM")
         return f"""{form_str} '{ggg}' ({','.join(entry["Gramm"])}, {entry["Type"]})"""
 
-    entries.rename(
-        columns={
-            obj_key: "Form",
-            var_key: "Variants",
-            "Senses": "Parameter_ID",
-            gloss_key: "Gloss",
-            "morph-type": "Type",
-        },
-        inplace=True,
-    )
-    gloss_key = "Gloss"
-    entries["Variants"] = entries["Variants"].apply(
-        lambda d: d if isinstance(d, list) else []
-    )
-    entries["Language_ID"] = obj_lg
-    entries = entries.fillna("")
-
-    # listify gloss and variant columns
-    for key in [gloss_key, var_key, "variant_morph-type"]:
-        if key in entries:
-            entries[key] = entries[key].apply(
-                lambda x: [] if not isinstance(x, list) else x
-            )
-
     entry_variants = {}
 
     def process_variant(entry, variant, var_count, idx):
@@ -244,22 +317,6 @@ def convert(
         variant["Parameter_ID"] = entry["Parameter_ID"]
         add_to_list_in_dict(entry_variants, entry["ID"], variant)
 
-    # 1. find all variants
-    # 2. compile dictionary mapping entry IDs to variants
-    for col in entries.columns:
-        if "variant-type" not in col:
-            continue
-        variants = entries[entries[col] != ""]
-        log.info(f"Parsing variants of type '{col} ({len(variants)} found)")
-        for entry in variants.to_dict("records"):
-            if len(entry[col]) > 1:
-                msg = f"""The entry {entry_repr(entry["ID"])} is stored as a variant ({col}) of multiple main entries:"""
-                for entry_id in entry[col]:
-                    msg += "\n* " + entry_repr(entry_id)
-                log.warning(msg)
-            for entry_id in entry[col]:
-                add_to_list_in_dict(var_dict, entry_id, entry)
-
     def resolve_variants(entry):
         for idx, variant in enumerate(  # iterate gathered variants for this entry
             var_dict.get(entry["ID"], [])
@@ -268,75 +325,70 @@ def convert(
                 entry=entry, variant=variant, var_count=len(entry["Variants"]), idx=idx
             )
 
-    entries.apply(lambda x: resolve_variants(x), axis=1)
+    with stage("variants"):
+        # 1. find all variants
+        # 2. compile dictionary mapping entry IDs to variants
+        for col in entries.columns:
+            if "variant-type" not in col:
+                continue
+            variants = entries[entries[col] != ""]
+            log.info(f"Parsing variants of type '{col} ({len(variants)} found)")
+            for entry in variants.to_dict("records"):
+                if len(entry[col]) > 1:
+                    msg = f"""The entry {entry_repr(entry["ID"])} is stored as a variant ({col}) of multiple main entries:"""
+                    for entry_id in entry[col]:
+                        msg += "\n* " + entry_repr(entry_id)
+                    log.warning(msg)
+                for entry_id in entry[col]:
+                    add_to_list_in_dict(var_dict, entry_id, entry)
+
+        for entry in entries.to_dict("records"):
+            resolve_variants(entry)
 
-    # delete variants
-    for col in entries.columns:
-        if "variant-type" not in col:
-            continue
-        variants = entries[entries[col] != ""]
-        entries = entries.loc[~(entries.index.isin(variants.index))]
-
-    # split up entries into lexemes, stems, morphemes, and morphs
-    morphemes = entries[~(entries["Type"].isin(["phrase"]))]
-    lexemes = entries[(entries["Type"].isin(["root", "stem"]))]
-
-    def split_into_variants(rec, abstract_key, main_variant=None):
-        for idx, (form, morph_type) in enumerate(
-            zip(
-                [rec["Form"]] + rec["Variants"],
-                [rec["Type"]] + rec["variant_morph-type"],
+        # delete variants
+        for col in entries.columns:
+            if "variant-type" not in col:
+                continue
+            variants = entries[entries[col] != ""]
+            entries = entries.loc[~(entries.index.isin(variants.index))]
+
+        # split up entries into lexemes, stems, morphemes, and morphs
+        morphemes = entries[~(entries["Type"].isin(["phrase"]))]
+        lexemes = entries[(entries["Type"].isin(["root", "stem"]))]
+
+        morphs = [
+            morph
+            for rec in morphemes.to_dict("records")
+            for morph in split_into_variants(rec, "Morpheme_ID", entry_variants)
+        ]
+        stems = [
+            stem
+            for rec in lexemes.to_dict("records")
+            for stem in split_into_variants(
+                rec, "Lexeme_ID", entry_variants, main_variant="Main_Stem"
             )
-        ):
-            new_rec = rec.copy()
-            new_rec[abstract_key] = rec["ID"]
-            new_rec["ID"] = rec["ID"] + f"-{idx}"
-            new_rec["Form"] = form
-            new_rec["Type"] = morph_type
-            if main_variant:
-                new_rec[main_variant] = rec["ID"] + "-0"
-            yield dict(new_rec)
-        for external_variant in entry_variants.get(rec["ID"], []):
-            external_variant[abstract_key] = rec["ID"]
-            if main_variant:
-                external_variant[main_variant] = rec["ID"] + "-0"
-            yield external_variant
-
-    morphs = []
-    stems = []
-    morphemes.apply(
-        lambda x: morphs.extend(split_into_variants(x, "Morpheme_ID")), axis=1
-    )
-
-    lexemes.apply(
-        lambda x: stems.extend(
-            split_into_variants(x, "Lexeme_ID", main_variant="Main_Stem")
-        ),
-        axis=1,
-    )
-    morphs = pd.DataFrame.from_dict(morphs)
-    morphs.drop_duplicates("ID", inplace=True)
-    for mid, dd in morphs.groupby("ID"):
-        if len(dd) > 1:
-            print(mid)
-            print(dd)
-    stems = pd.DataFrame.from_dict(stems)
-    stems = stems[(stems["Type"].isin(["root", "stem"]))]
-
-    sentence_path = Path(output_dir / "examples.csv")
+        ]
+        # external variants are shared between morphs and stems, so both tables
+        # are only built once all of them have been annotated
+        morphs = pd.DataFrame.from_dict(morphs)
+        morphs.drop_duplicates("ID", inplace=True)
+        stems = pd.DataFrame.from_dict(stems)
+        stems = stems[(stems["Type"].isin(["root", "stem"]))]
+
+    sentence_path = find_table(output_dir, "examples")
     ref_pattern = re.compile(r"^(\d+.\d)+$")
     if dictionary_examples:
-        if sentence_path.is_file():
+        if sentence_path:
             log.info(
                 f"Found {sentence_path.resolve()}, adding segmentation to examples"
             )
-            glossed_examples = pd.read_csv(
-                sentence_path, dtype=str, keep_default_na=False
-            )
+            glossed_examples = read_table(sentence_path, "examples")
             juicy_columns = ["Analyzed_Word", "Gloss"]
             glossed_examples.dropna(subset=juicy_columns, inplace=True)
             for col in juicy_columns:
                 glossed_examples = listify(glossed_examples, col, "\t")
+            example_records = glossed_examples.to_dict("records")
+            example_index = index_examples(example_records, f"segnum_{gloss_lg}_phrase")
             enriched_examples = []
             for ex in dictionary_examples:
                 successful = False
@@ -344,25 +396,22 @@ def convert(
                     text_id, phrase_rec = ex["source"].strip(" ").split(" ")
                     if ref_pattern.match(phrase_rec):
                         rec, subrec = phrase_rec.split(".")
-                        cands = glossed_examples[
-                            (glossed_examples["Sentence_Number"] == rec)
-                            & glossed_examples["Text_ID"].str.contains(text_id)
-                        ]
+                        cands = find_examples(example_index, text_id, rec)
                         if len(cands) == 1:
                             successful = True
-                            enriched_examples.append(dict(cands.iloc[0]))
+                            enriched_examples.append(example_records[cands[0]])
                         elif len(cands) > 1:
-                            cands = cands[
-                                cands[f"segnum_{gloss_lg}_phrase"] == phrase_rec
-                            ]
+                            cands = find_examples(
+                                example_index, text_id, rec, phrase_rec
+                            )
                             if len(cands) == 1:
                                 successful = True
-                                enriched_examples.append(dict(cands.iloc[0]))
+                                enriched_examples.append(example_records[cands[0]])
                             else:
                                 log.warning(
                                     f"Could not resolve ambiguous example reference [{text_id} {phrase_rec}]\n"
+                                    f"{glossed_examples.iloc[cands]}"
                                 )
-                                print(cands)
                         else:
                             log.warning(
                                 f"Could not resolve example reference [{text_id} {phrase_rec}]"
@@ -372,7 +421,7 @@ def convert(
             dictionary_examples = pd.DataFrame.from_dict(enriched_examples)
         else:
             log.warning(
-                f"There are dictionary examples. If you want to retrieve segmentation and glosses from the corpus, run cldflex corpus <your_file>.flextext once. This will generate a {sentence_path} file."
+                f"There are dictionary examples. If you want to retrieve segmentation and glosses from the corpus, run cldflex corpus <your_file>.flextext once. This will generate a {output_dir / 'examples.csv'} file."
             )
             dictionary_examples = pd.DataFrame.from_dict(dictionary_examples)
     else:
@@ -389,70 +438,84 @@ def convert(
             for df in [entries, morphemes, morphs, dictionary_examples]:
                 df["Language_ID"] = obj_lg
 
-    if output_dir:
-        for df, name in [
-            (entries, "entries"),
-            (stems, "stems"),
-            (lexemes, "lexemes"),
-            (morphs, "morphs"),
-            (morphemes, "morphemes"),
-            (senses, "senses"),
-        ]:
-            df = delistify(df, sep)
-            dump(df, output_dir / f"{name}.csv")
-        log.info(f"Wrote CSV data to {output_dir.resolve()}")
-    if cldf:
-        cldf_settings = conf.get("cldf", {})
-        metadata = cldf_settings.get("metadata", {})
-        if cldf_mode == "wordlist":
-            create_wordlist_dataset(
-                forms=entries,
-                senses=senses,
-                glottocode=glottocode,
-                metadata=metadata,
-                output_dir=output_dir,
-                cwd=lift_file.parents[0],
-                sep=sep,
-                parameters=cldf_settings.get("parameters", "multi"),
-            )
-        elif cldf_mode == "dictionary":
-            if cldf_settings.get("drop_empty", False):
-                senses = senses[senses["Description"] != ""]
-            senses = senses[senses["Entry_ID"].isin(entries["ID"].values)]
-            create_dictionary_dataset(
-                entries,
-                senses,
-                metadata=metadata,
-                examples=dictionary_examples,
-                glottocode=glottocode,
-                output_dir=output_dir,
-                cwd=lift_file.parents[0],
-            )
-        elif cldf_mode == "rich":
-            tables = {}
-            with pd.option_context("mode.chained_assignment", None):
-                for namedf in [morphs, lexemes, morphemes, stems]:
-                    namedf.rename(columns={"Form": "Name"}, inplace=True)
-
-            for name, df in [
-                ("morphemes", morphemes),
-                ("morphs", morphs),
-                ("lexemes", lexemes),
-                ("stems", stems),
-                ("senses", senses),
+    with stage("csv"):
+        if output_dir:
+            for df, name in [
+                (entries, "entries"),
+                (stems, "stems"),
+                (lexemes, "lexemes"),
+                (morphs, "morphs"),
+                (morphemes, "morphemes"),
+                (senses, "senses"),
             ]:
-                if len(df) > 0:
-                    tables[name] = df
-            create_corpus_dataset(
-                tables=tables,
-                glottocode=glottocode,
-                metadata=metadata,
-                output_dir=output_dir,
-                cwd=lift_file.parents[0],
-                sep=sep,
-                parameters=cldf_settings.get("parameters", "multi"),
+                write_table(df, output_dir, name, sep, table_format)
+                # the CLDF and returned tables have always been delistified
+                delistify(df, sep)
+            log.info(f"Wrote {table_format} data to {output_dir.resolve()}")
+    if cldf:
+        with stage("cldf"):
+            # pylint: disable-next=import-outside-toplevel
+            from cldflex.cldf import (
+                create_corpus_dataset,
+                create_dictionary_dataset,
+                create_wordlist_dataset,
+                get_validation,
             )
-        else:
-            raise ValueError(cldf_mode)
+
+            cldf_settings = conf.get("cldf", {})
+            metadata = cldf_settings.get("metadata", {})
+            if cldf_mode == "wordlist":
+                create_wordlist_dataset(
+                    forms=entries,
+                    senses=senses,
+                    glottocode=glottocode,
+                    metadata=metadata,
+                    output_dir=output_dir,
+                    cwd=lift_file.parents[0],
+                    sep=sep,
+                    parameters=cldf_settings.get("parameters", "multi"),
+                    **get_validation(cldf_settings, validation),
+                )
+            elif cldf_mode == "dictionary":
+                if cldf_settings.get("drop_empty", False):
+                    senses = senses[senses["Description"] != ""]
+                senses = senses[senses["Entry_ID"].isin(entries["ID"].values)]
+                create_dictionary_dataset(
+                    entries,
+                    senses,
+                    metadata=metadata,
+                    examples=dictionary_examples,
+                    glottocode=glottocode,
+                    output_dir=output_dir,
+                    cwd=lift_file.parents[0],
+                    **get_validation(cldf_settings, validation),
+                )
+            elif cldf_mode == "rich":
+                tables = {}
+                with pd.option_context("mode.chained_assignment", None):
+                    for namedf in [morphs, lexemes, morphemes, stems]:
+                        namedf.rename(columns={"Form": "Name"}, inplace=True)
+
+                for name, df in [
+                    ("morphemes", morphemes),
+                    ("morphs", morphs),
+                    ("lexemes", lexemes),
+                    ("stems", stems),
+                    ("senses", senses),
+                ]:
+                    if len(df) > 0:
+                        tables[name] = df
+                create_corpus_dataset(
+                    tables=tables,
+                    glottocode=glottocode,
+                    metadata=metadata,
+                    output_dir=output_dir,
+                    cwd=lift_file.parents[0],
+                    sep=sep,
+                    parameters=cldf_settings.get("parameters", "multi"),
+                    **get_validation(cldf_settings, validation),
+                )
+            else:
+                raise ValueError(cldf_mode)
 
     return lexemes, stems, morphemes, morphs, senses
@@ -0,0 +1,164 @@
+"""Wall time, CPU time and peak memory of conversion stages."""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+log = logging.getLogger(__name__)
+
+INTERVAL = 0.01  # seconds between samples of the memory used by running stages
+
+
+def peak_rss():
+    """The highest resident set size of this process so far, in bytes"""
+    if resource is None:  # pragma: no cover
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":  # pragma: no cover
+        return peak
+    return peak * 1024
+
+
+def current_rss():
+    """The resident set size of this process, in bytes. Where it can not be
+    read from /proc, this is the highest resident set size so far."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):  # pragma: no cover
+        return peak_rss()
+
+
+class Profiler:
+    """Collects the measurements of all stages run while it is active.
+    Repeated stages with the same path are added up. The memory used by the
+    running stages is sampled in a background thread."""
+
+    def __init__(self, interval=INTERVAL):
+        self.start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.stages = {}
+        self.path = []
+        self.total = None
+        self.running = []  # the timings of the stages being measured
+        self.done = threading.Event()
+        self.sampler = threading.Thread(
+            target=self.sample_memory, args=(interval,), daemon=True
+        )
+        self.sampler.start()
+
+    def sample_memory(self, interval):
+        while not self.done.wait(interval):
+            self.update_peaks()
+
+    def update_peaks(self):
+        rss = current_rss()
+        for timing in list(self.running):
+            timing["peak_rss"] = max(timing.get("peak_rss") or 0, rss)
+
+    def add(self, name, timing):
+        path = "/".join(self.path + [name])
+        if path not in self.stages:
+            self.stages[path] = {
+                "stage": path,
+                "start": timing["start"] - self.start,
+                "calls": 0,
+                "wall_time": 0,
+                "cpu_time": 0,
+            }
+        record = self.stages[path]
+        record["calls"] += 1
+        record["wall_time"] += timing["wall_time"]
+        record["cpu_time"] += timing["cpu_time"]
+        record["peak_rss"] = max(record.get("peak_rss") or 0, timing["peak_rss"])
+
+    def stop(self):
+        self.done.set()
+        self.total = {
+            "wall_time": time.perf_counter() - self.start,
+            "cpu_time": time.process_time() - self.cpu_start,
+            "peak_rss": peak_rss(),
+        }
+
+    def report(self):
+        if self.total is None:
+            self.stop()
+        return {
+            "stages": sorted(self.stages.values(), key=lambda x: x["start"]),
+            "total": self.total,
+        }
+
+    def write(self, path):
+        path = Path(path)
+        path.write_text(json.dumps(self.report(), indent=2), encoding="utf-8")
+        log.info(f"Wrote profile to {path.resolve()}")
+
+
+profiler = None  # the active profiler, if any
+
+
+@contextmanager
+def stage(name):
+    """Measure a stage of a conversion. Yields a dict which is filled with
+    the wall time and CPU time (in seconds) and the peak RSS (in bytes)
+    once the stage is over. The peak RSS is that of this process during the
+    stage while a profiler is active, and its RSS at the end otherwise.
+    Stages run inside other stages are recorded as parent/child."""
+    timing = {"start": time.perf_counter(), "peak_rss": current_rss()}
+    cpu_start = time.process_time()
+    active = profiler
+    if active:
+        active.path.append(name)
+        active.running.append(timing)
+    try:
+        yield timing
+    finally:
+        timing["wall_time"] = time.perf_counter() - timing["start"]
+        timing["cpu_time"] = time.process_time() - cpu_start
+        if active:
+            active.update_peaks()
+            active.running.remove(timing)
+            active.path.pop()
+            active.add(name, timing)
+        else:
+            timing["peak_rss"] = current_rss()
+
+
+def timed(iterable, name):
+    """Record the time spent producing the items of an iterable as a stage"""
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            item = next(iterator, StopIteration)
+        if item is StopIteration:
+            return
+        yield item
+
+
+@contextmanager
+def profile(path=None):
+    """Profile all conversions run in this block and, if a path is given,
+    write a JSON report there.
+
+    >>> with profile("profile.json") as profiler:
+    ...     convert("texts.flextext")
+    """
+    global profiler  # pylint: disable=global-statement
+    previous = profiler
+    profiler = active = Profiler()
+    try:
+        yield active
+    finally:
+        profiler = previous
+        active.stop()
+        if path:
+            active.write(path)
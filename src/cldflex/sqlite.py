@@ -0,0 +1,78 @@
+"""Writing converted tables to a single SQLite database."""
+import logging
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_float_dtype, is_integer_dtype
+
+log = logging.getLogger(__name__)
+
+DATABASE = "cldflex.sqlite"
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def column_type(values):
+    if is_bool_dtype(values) or is_integer_dtype(values):
+        return "INTEGER"
+    if is_float_dtype(values):
+        return "REAL"
+    return "TEXT"
+
+
+def index_columns(df):
+    """Columns referring to other tables, like Example_ID or Morph_ID"""
+    return [col for col in df.columns if col.endswith("_ID")]
+
+
+def write_sqlite_table(df, path, name):
+    """Replace a table in the database at path with the contents of df,
+    which must not contain lists. ID is the primary key if its values are
+    unique, and all *_ID columns are indexed."""
+    columns = [
+        f"{quote(col)} {column_type(df[col])}"
+        + (" PRIMARY KEY" if col == "ID" and df[col].is_unique else "")
+        for col in df.columns
+    ]
+    if "ID" in df.columns and not df["ID"].is_unique:
+        log.warning(f"Table {name} contains duplicate IDs, not adding a primary key")
+    insert = f"INSERT INTO {quote(name)} VALUES ({', '.join('?' * len(df.columns))})"
+    rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    con = sqlite3.connect(path)
+    try:
+        # a single transaction per table
+        with con:
+            con.execute(f"DROP TABLE IF EXISTS {quote(name)}")
+            con.execute(f"CREATE TABLE {quote(name)} ({', '.join(columns)})")
+            con.executemany(insert, rows)
+            for col in index_columns(df):
+                index = quote(f"{name}_{col}")
+                con.execute(f"CREATE INDEX {index} ON {quote(name)} ({quote(col)})")
+    finally:
+        con.close()
+
+
+def has_sqlite_table(path, name):
+    if not Path(path).is_file():
+        return False
+    con = sqlite3.connect(path)
+    try:
+        return (
+            con.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+            ).fetchone()
+            is not None
+        )
+    finally:
+        con.close()
+
+
+def read_sqlite_table(path, name):
+    con = sqlite3.connect(path)
+    try:
+        return pd.read_sql_query(f"SELECT * FROM {quote(name)}", con)
+    finally:
+        con.close()
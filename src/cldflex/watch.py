@@ -0,0 +1,80 @@
+"""Rerunning conversions when their input files change."""
+import logging
+import time
+from pathlib import Path
+
+import humidifier
+
+from cldflex import helpers
+
+log = logging.getLogger(__name__)
+
+INTERVAL = 0.5  # seconds between checks for changes
+
+
+def snapshot(paths):
+    """The modification times and sizes of the existing files in paths"""
+    res = {}
+    for path in paths:
+        if path is None:
+            continue
+        path = Path(path)
+        try:
+            stat = path.stat()
+        except OSError:  # missing, e.g. while being replaced by an editor
+            continue
+        if path.is_file():
+            res[path] = (stat.st_mtime_ns, stat.st_size)
+    return res
+
+
+def poll(get_paths):
+    """A snapshot of the files returned by get_paths(), or None if they can
+    not be listed right now"""
+    try:
+        return snapshot(get_paths())
+    except (Exception, SystemExit) as e:  # pylint: disable=broad-exception-caught
+        log.warning(f"Could not check files for changes: {e!r}")
+        return None
+
+
+def run(convert):
+    """Run a conversion with fresh ID registries, so that IDs are the same as
+    in a separate run. Errors are logged instead of ending the watch."""
+    humidifier.og_humidifier = humidifier.Humidifier()
+    helpers.reset_slugs()
+    start = time.perf_counter()
+    try:
+        convert()
+    except (Exception, SystemExit) as e:  # pylint: disable=broad-exception-caught
+        log.error(f"Conversion failed: {e!r}")
+        return
+    log.info(f"Converted in {time.perf_counter() - start:.2f}s")
+
+
+def watch(convert, get_paths, interval=INTERVAL, runs=None):
+    """Run convert() now and whenever one of the files returned by
+    get_paths() is changed, added, or removed, until interrupted. The files
+    are polled every <interval> seconds. With <runs>, stop after that many
+    conversions."""
+    files = poll(get_paths) or {}
+    run(convert)
+    count = 1
+    log.info(f"Watching {len(files)} files for changes, press Ctrl+C to stop")
+    try:
+        while runs is None or count < runs:
+            time.sleep(interval)
+            current = poll(get_paths)
+            if current is None or current == files:
+                continue
+            changed = sorted(
+                str(path)
+                for path in set(files) | set(current)
+                if files.get(path) != current.get(path)
+            )
+            log.info(f"Changed: {', '.join(changed)}")
+            files = current
+            run(convert)
+            count += 1
+    except KeyboardInterrupt:
+        log.info("Stopped watching")
@@ -1,3 +1,4 @@
+import humidifier
 import pytest
 from pathlib import Path
 
@@ -13,4 +14,16 @@ def flextext(data):
 
 @pytest.fixture
 def lift(data):
-    return data / "apalai.lift"
\ No newline at end of file
+    return data / "apalai.lift"
+
+
+@pytest.fixture
+def fresh_ids(monkeypatch):
+    """Start each test with an empty ID registry, as in a separate run; call
+    the fixture's value to start another one"""
+
+    def reset():
+        monkeypatch.setattr(humidifier, "og_humidifier", humidifier.Humidifier())
+
+    reset()
+    return reset
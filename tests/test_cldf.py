@@ -1,6 +1,9 @@
 from click.testing import CliRunner
+from cldflex.cldf import iter_records, validate_dataset
 from cldflex.cli import corpus, dictionary
-from pycldf import Dataset
+from cldflex.lift2csv import convert as lift2csv
+from csvw.metadata import ForeignKey
+from pycldf import Dataset, Generic
 from pathlib import Path
 import shutil
 import pandas as pd
@@ -156,3 +159,66 @@ def test_lift(data, tmp_path, monkeypatch):
     assert md_path.is_file()
     ds = Dataset.from_metadata(md_path)
     assert ds.validate()
+
+
+def test_iter_records():
+    df = pd.DataFrame({"ID": [f"x{i}" for i in range(25)], "Form": "a"})
+    records = iter_records(df, chunksize=10)
+    assert not isinstance(records, list)
+    assert list(records) == df.to_dict("records")
+    assert not list(iter_records(df.iloc[0:0]))
+
+
+def test_validation_modes(data, tmp_path, caplog):
+    shutil.copy(data / "apalai.lift", tmp_path)
+    (tmp_path / "languages.csv").write_text(
+        "ID,Name,Latitude,Longitude\napy,Apalai,,\n"
+    )
+    conf = {"lang_id": "apy", "cldf": {"validation": "sample"}}
+    lift2csv(
+        tmp_path / "apalai.lift",
+        output_dir=tmp_path,
+        conf=conf,
+        cldf=True,
+        cldf_mode="wordlist",
+    )
+    assert "Validating schema, keys and up to 1000 rows" in caplog.text
+    assert (tmp_path / "cldf" / "README.md").is_file()
+
+    ds = Dataset.from_metadata(tmp_path / "cldf" / "metadata.json")
+    assert validate_dataset(ds, "sample", sample_size=10)
+    forms = pd.read_csv(tmp_path / "cldf" / "forms.csv", keep_default_na=False)
+    forms.loc[0, "Parameter_ID"] = "nonexistent"
+    forms = pd.concat([forms, forms.iloc[[1]]])
+    forms.to_csv(tmp_path / "cldf" / "forms.csv", index=False)
+    caplog.clear()
+    assert not validate_dataset(ds, "sample", sample_size=10)
+    assert "key nonexistent not found in parameters.csv" in caplog.text
+    assert "duplicate primary key" in caplog.text
+    assert validate_dataset(ds, "off")
+
+    # composite keys are compared as a whole
+    ds = Generic.in_dir(tmp_path / "composite")
+    ds.add_table("phrases.csv", "Text_ID", "Number", primaryKey=["Text_ID", "Number"])
+    table = ds.add_table("refs.csv", "ID", "Text_ID", "Number", primaryKey=["ID"])
+    table.tableSchema.foreignKeys.append(
+        ForeignKey.fromdict(
+            {
+                "columnReference": ["Text_ID", "Number"],
+                "reference": {
+                    "resource": "phrases.csv",
+                    "columnReference": ["Text_ID", "Number"],
+                },
+            }
+        )
+    )
+    phrases = [{"Text_ID": "a", "Number": "1"}, {"Text_ID": "a", "Number": "2"}]
+    refs = [{"ID": "r1", "Text_ID": "a", "Number": "2"}]
+    ds.write(**{"phrases.csv": phrases, "refs.csv": refs})
+    assert validate_dataset(ds, "full")
+    assert validate_dataset(ds, "sample")
+    ds.write(**{"phrases.csv": phrases[:1] * 2, "refs.csv": refs})
+    caplog.clear()
+    assert not validate_dataset(ds, "sample")
+    assert "phrases.csv:3 duplicate primary key a, 1" in caplog.text
+    assert "refs.csv:Text_ID, Number key a, 2 not found in phrases.csv" in caplog.text
@@ -0,0 +1,37 @@
+import subprocess
+import sys
+
+import pytest
+
+CLDF_MODULES = ["pycldf", "cldfbench", "cldf_ldd", "csvw"]
+
+
+def import_times(module):
+    """Run python -X importtime and get the cumulative import time (in
+    microseconds) of every module imported by module"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_cli_imports():
+    times = import_times("cldflex.cli")
+    for module in ["pandas", "bs4", "humidifier", "morphinder"] + CLDF_MODULES:
+        assert module not in times
+
+
+@pytest.mark.parametrize("module", ["cldflex.flex2csv", "cldflex.lift2csv"])
+def test_converter_imports(module):
+    times = import_times(module)
+    for cldf_module in CLDF_MODULES:
+        assert cldf_module not in times
@@ -1,8 +1,29 @@
 """Tests for the cldflex.my_module module.
 """
+import json
+import shutil
+import sqlite3
+
+import humidifier
 import pandas as pd
+import pytest
 
-from cldflex.flex2csv import convert
+from cldflex.flex2csv import (
+    IDMemo,
+    IDRecorder,
+    MemoryCache,
+    MorphRetriever,
+    convert,
+    find_flextext_files,
+    iter_texts,
+    join_interlinear_lines,
+    load_pickle,
+    set_id_scope,
+    split_subrecords,
+)
+from cldflex.helpers import read_table
+from cldflex.profiling import profile, stage
+from cldflex.watch import watch
 
 
 def test_convert(flextext, monkeypatch, tmp_path, data):
@@ -67,3 +88,313 @@ def test_with_lexicon(flextext, monkeypatch, tmp_path, data):
         df2 = df2[sorted(df2.columns)]
 
         pd.testing.assert_frame_equal(df1, df2)
+
+
+def test_iter_texts(flextext):
+    texts = list(iter_texts(flextext))
+    assert [text.name for text in texts] == ["interlinear-text"] * 2
+    assert texts[0]["guid"] == "bfd12693-a187-4dce-9a8a-bfbe9828d04c"
+    assert texts[0].find("item", type="title-abbreviation").text == "po2"
+
+
+def test_parallel(flextext, lift, fresh_ids, tmp_path):
+    for jobs in [1, 3]:
+        fresh_ids()
+        output_dir = tmp_path / str(jobs)
+        output_dir.mkdir()
+        convert(
+            flextext,
+            lexicon_file=lift,
+            conf={"lang_id": "apy"},
+            output_dir=output_dir,
+            jobs=jobs,
+        )
+    for name in ["examples", "exampleparts", "wordforms", "wordformparts", "texts"]:
+        serial = (tmp_path / "1" / f"{name}.csv").read_text(encoding="utf-8")
+        assert serial == (tmp_path / "3" / f"{name}.csv").read_text(encoding="utf-8")
+
+
+def test_cache(flextext, lift, fresh_ids, tmp_path, caplog):
+    for run in ["plain", "cold", "warm"]:
+        fresh_ids()
+        output_dir = tmp_path / run
+        if run == "warm":
+            (tmp_path / "cold").rename(output_dir)
+        else:
+            output_dir.mkdir()
+        convert(
+            flextext,
+            lexicon_file=lift,
+            conf={"lang_id": "apy"},
+            output_dir=output_dir,
+            cache=run != "plain",
+        )
+    assert "Reused 2 of 2 texts from cache" in caplog.text
+    assert "has not changed, using" in caplog.text
+    cache_dir = tmp_path / "warm" / ".cldflex-cache"
+    assert len(list((cache_dir / "texts").iterdir())) == 2
+    assert len(list(cache_dir.glob("lexicon-*.pickle"))) == 1
+    for name in ["examples", "exampleparts", "wordforms", "wordformparts", "texts"]:
+        plain = (tmp_path / "plain" / f"{name}.csv").read_text(encoding="utf-8")
+        assert plain == (tmp_path / "warm" / f"{name}.csv").read_text(encoding="utf-8")
+
+
+def test_cache_unreadable(flextext, fresh_ids, tmp_path, caplog):
+    convert(flextext, conf={"lang_id": "apy"}, output_dir=tmp_path, cache=True)
+    entries = sorted((tmp_path / ".cldflex-cache" / "texts").iterdir())
+    # a write interrupted by the previous implementation
+    entries[0].write_bytes(entries[0].read_bytes()[:20])
+    (entries[0].parent / "leftover.tmp").write_bytes(b"")
+    fresh_ids()
+    convert(flextext, conf={"lang_id": "apy"}, output_dir=tmp_path, cache=True)
+    assert "Ignoring unreadable cache file" in caplog.text
+    assert "Reused 1 of 2 texts from cache" in caplog.text
+    assert sorted(entries[0].parent.iterdir()) == entries
+
+
+def test_lexicon_cache_unreadable(flextext, lift, fresh_ids, tmp_path, caplog):
+    kwargs = {"lexicon_file": lift, "conf": {"lang_id": "apy"}, "cache": True}
+    plain = convert(flextext, output_dir=tmp_path, **kwargs)
+    (cache_path,) = (tmp_path / ".cldflex-cache").glob("lexicon-*.pickle")
+    cache_path.write_bytes(cache_path.read_bytes()[:100])
+    fresh_ids()
+    tables = convert(flextext, output_dir=tmp_path, **kwargs)
+    assert "Ignoring unreadable cache file" in caplog.text
+    assert "has not changed, using" not in caplog.text
+    pd.testing.assert_frame_equal(tables["wordformparts"], plain["wordformparts"])
+    assert load_pickle(cache_path) is not None
+
+
+def test_morph_retriever(flextext, lift, fresh_ids, tmp_path, caplog):
+    lexicon = pd.DataFrame(
+        [
+            {"ID": "m1", "Form_Bare": "pyra", "Gloss": "NEG", "Type": "root"},
+            {"ID": "m2", "Form_Bare": "pyra", "Gloss": "NEG", "Type": "suffix"},
+        ]
+    )
+    lexicon["Parameter_ID"] = [["s1"], ["s2"]]
+    retriever = MorphRetriever(lexicon)
+    assert retriever.retrieve("pyra", "NEG", "root") == ("m1", "s1")
+    assert retriever.retrieve("pyra", "NEG", "suffix") == ("m2", "s2")
+    assert retriever.retrieve("pyra", "NEG", "root") == ("m1", "s1")
+    assert retriever.lookups == (1, 2)
+    assert retriever.retrieve("pyra", "NEG", "prefix") == ("m1", "s1")
+    assert retriever.retrieve("pyra", "ABL", "root") == (None, None)
+
+    # the lookups are reported in the summary in every mode
+    for kwargs in [{}, {"jobs": 2}, {"cache": True}, {"cache": True}]:
+        fresh_ids()
+        caplog.clear()
+        convert(flextext, lexicon_file=lift, output_dir=tmp_path, conf={}, **kwargs)
+        assert "Morph lookups:" in caplog.text
+        if not kwargs:
+            assert "262 (105 memoized, 157 searched in lexicon)" in caplog.text
+    assert "Morph lookups: 0 (0 memoized, 0 searched in lexicon)" in caplog.text
+
+
+def test_join_interlinear_lines():
+    lines = [
+        {"morph_type": ["root"], "txt": "a", "gls": "A"},
+        {"morph_type": [], "txt": "b="},
+        {"morph_type": ["root"], "txt": "c", "gls": "C", "pos": "n"},
+    ]
+    assert join_interlinear_lines(lines) == {
+        "txt": "a\tb=c",
+        "gls": "A\t\tC",
+        "pos": "\t\tn",
+    }
+    assert join_interlinear_lines(lines, fix_clitics=False)["txt"] == "a\tb=\tc"
+    assert not join_interlinear_lines([])
+
+
+def test_split_subrecords():
+    df = pd.DataFrame({"Sentence_Number": ["1", "2.1", "2.2"], "Text_ID": "a"})
+    df = split_subrecords(df)
+    assert list(df["Sentence_Number"]) == ["1", "2", "2"]
+    assert list(df["Phrase_Number"].fillna("")) == ["", "1", "2"]
+    df = split_subrecords(pd.DataFrame({"Sentence_Number": ["1", "2"]}))
+    assert list(df.columns) == ["Sentence_Number"]
+    df = split_subrecords(
+        pd.DataFrame({"z": "x", "Sentence_Number": ["1.1", "1.2"], "b": "y"})
+    )
+    assert list(df.columns) == ["z", "Sentence_Number", "b", "Phrase_Number"]
+    assert list(df["Phrase_Number"]) == ["1", "2"]
+    df = split_subrecords(
+        pd.DataFrame({"z": "x", "Sentence_Number": ["1", "1.2"], "b": "y"})
+    )
+    assert list(df.columns) == ["Phrase_Number", "Sentence_Number", "b", "z"]
+
+
+def test_profile(flextext, lift, fresh_ids, tmp_path):
+    with profile(tmp_path / "profile.json") as profiler:
+        convert(flextext, lexicon_file=lift, output_dir=tmp_path, conf={})
+    report = json.loads((tmp_path / "profile.json").read_text())
+    assert report == json.loads(json.dumps(profiler.report()))
+    stages = {x["stage"]: x for x in report["stages"]}
+    for name in ["parse", "lexicon", "lexicon/variants", "extract", "prepare", "csv"]:
+        assert stages[name]["wall_time"] >= 0
+        assert stages[name]["peak_rss"] > 0
+    assert stages["extract"]["calls"] == 2
+    assert report["total"]["wall_time"] >= stages["lexicon"]["wall_time"]
+    with stage("outside") as timing:
+        pass
+    assert timing["wall_time"] >= 0
+    assert "outside" not in profiler.stages
+
+    # the peak memory is that of each stage, not of the process so far
+    with profile() as profiler:
+        with stage("large"):
+            data = b"x" * 2**26
+        del data
+        with stage("small"):
+            pass
+    stages = profiler.report()["stages"]
+    assert stages[0]["peak_rss"] > stages[1]["peak_rss"] + 2**25
+
+
+@pytest.mark.parametrize("table_format", ["parquet", "feather"])
+def test_table_format(flextext, lift, fresh_ids, tmp_path, table_format):
+    pytest.importorskip("pyarrow")
+    convert(
+        flextext,
+        lexicon_file=lift,
+        output_dir=tmp_path,
+        conf={},
+        table_format=table_format,
+    )
+    assert not list(tmp_path.glob("*.csv"))
+    morphs = read_table(tmp_path / f"morphs.{table_format}", "morphs")
+    assert all(isinstance(x, list) for x in morphs["Parameter_ID"])
+    wordformparts = read_table(
+        tmp_path / f"wordformparts.{table_format}", "wordformparts"
+    )
+    assert len(wordformparts) > 0
+
+
+def test_sqlite(flextext, lift, fresh_ids, tmp_path):
+    tables = convert(
+        flextext,
+        lexicon_file=lift,
+        output_dir=tmp_path,
+        conf={},
+        table_format="sqlite",
+    )
+    assert not list(tmp_path.glob("*.csv"))
+    con = sqlite3.connect(tmp_path / "cldflex.sqlite")
+    for name, df in tables.items():
+        assert con.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0] == len(df)
+    indexes = {
+        row[0]
+        for row in con.execute("SELECT name FROM sqlite_master WHERE type='index'")
+    }
+    assert "wordformparts_Morph_ID" in indexes
+    assert "exampleparts_Example_ID" in indexes
+    assert "morphs_Parameter_ID" in indexes
+    # primary keys are indexed automatically
+    assert "sqlite_autoindex_examples_1" in indexes
+    con.close()
+
+
+def test_batch(flextext, lift, fresh_ids, tmp_path):
+    single = convert(flextext, lexicon_file=lift, output_dir=tmp_path, conf={})
+    texts = tmp_path / "texts"
+    texts.mkdir()
+    for name in ["a.flextext", "b.flextext"]:
+        shutil.copy(flextext, texts / name)
+    for paths in [texts, [texts / "a.flextext", texts / "b.flextext"], texts / "*"]:
+        fresh_ids()
+        batch = convert(paths, lexicon_file=lift, output_dir=tmp_path, conf={})
+        for name in ["texts", "examples", "exampleparts"]:
+            assert len(batch[name]) == 2 * len(single[name])
+            assert batch[name]["ID"].is_unique
+        assert len(batch["wordforms"]) == len(single["wordforms"])
+    for jobs in [1, 2]:
+        fresh_ids()
+        parallel = convert(
+            texts, lexicon_file=lift, output_dir=tmp_path, conf={}, jobs=jobs
+        )
+        pd.testing.assert_frame_equal(parallel["examples"], batch["examples"])
+    with pytest.raises(SystemExit):
+        convert(tmp_path / "*.missing", output_dir=tmp_path, conf={})
+
+
+def test_watch(flextext, lift, fresh_ids, tmp_path, caplog):
+    text_file = tmp_path / "texts.flextext"
+    text_file.write_text(flextext.read_text(encoding="utf-8"), encoding="utf-8")
+    cache = MemoryCache()
+    outputs = []
+
+    def run():
+        outputs.append(
+            convert(
+                text_file,
+                lexicon_file=lift,
+                conf={"lang_id": "apy"},
+                output_dir=tmp_path,
+                cache=cache,
+            )
+        )
+        if len(outputs) == 1:
+            # edit the title of the first text
+            xml = text_file.read_text(encoding="utf-8")
+            text_file.write_text(xml.replace("jaguar", "JAGUAR", 1), encoding="utf-8")
+
+    watch(run, lambda: [text_file, lift], interval=0.01, runs=2)
+    assert "Reused 1 of 2 texts from cache" in caplog.text
+    assert f"Lexicon {lift} has not changed" in caplog.text
+    assert len(cache.texts) == 2
+    assert "The JAGUAR" in outputs[1]["texts"].to_csv()
+    assert "The JAGUAR" not in outputs[0]["texts"].to_csv()
+    # IDs are the same as in a separate run
+    for name in ["examples", "wordforms", "texts"]:
+        assert list(outputs[0][name]["ID"]) == list(outputs[1][name]["ID"])
+
+
+def test_watch_missing_files(flextext, fresh_ids, tmp_path, caplog):
+    text_file = tmp_path / "texts.flextext"
+    shutil.copy(flextext, text_file)
+    polls = []
+    outputs = []
+
+    def get_paths():
+        polls.append(len(polls))
+        if len(polls) == 2:
+            # an editor saving a new file and renaming it over the old one
+            text_file.unlink()
+        elif len(polls) == 3:
+            xml = flextext.read_text(encoding="utf-8")
+            text_file.write_text(xml.replace("jaguar", "JAGUAR", 1), encoding="utf-8")
+        return find_flextext_files(text_file)
+
+    def run():
+        outputs.append(convert(text_file, conf={}, output_dir=tmp_path))
+
+    watch(run, get_paths, interval=0.01, runs=2)
+    assert "Could not check files for changes" in caplog.text
+    assert len(polls) == 3
+    assert "The JAGUAR" in outputs[1]["texts"].to_csv()
+
+
+def test_id_memo(flextext, lift, fresh_ids, monkeypatch, tmp_path, caplog):
+    memo = IDMemo()
+    monkeypatch.setattr(humidifier, "og_humidifier", IDRecorder())
+    set_id_scope("word")
+    first = memo.humidify("dog", "meanings")
+    assert memo.humidify("dog", "meanings") == first
+    set_id_scope(None)
+    # the call in the scope of the word may not be replayed
+    assert memo.humidify("dog", "meanings") != first
+    assert memo.lookups == (3, 1)
+    assert len(humidifier.og_humidifier.calls) == 2
+
+    stats = []
+    for kwargs in [{}, {"jobs": 2}, {"cache": True}, {"cache": True}]:
+        fresh_ids()
+        caplog.clear()
+        convert(flextext, lexicon_file=lift, output_dir=tmp_path, conf={}, **kwargs)
+        stats.append(
+            [x for x in caplog.text.splitlines() if "Gloss and meaning IDs" in x]
+        )
+    # parallel and cached runs count the lookups of a serial run
+    assert stats[0][0].endswith("794 lookups (249 distinct)")
+    assert stats[1:] == [stats[0]] * 3
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+import re
+
+from cldflex.helpers import (
+    DELIMITERS,
+    delistify,
+    get_tokenizer,
+    list_columns,
+    listify,
+    reset_slugs,
+    slug,
+)
+
+
+def test_delistify():
+    df = pd.DataFrame(
+        {
+            "ID": ["a", "b", "c"],
+            "Gloss": [["x", "y"], np.nan, []],
+            "Form": ["x", "y", np.nan],
+            "Index": [1, 2, 3],
+        }
+    )
+    assert list_columns(df) == ["Gloss"]
+    df = delistify(df, "; ")
+    assert list(df["Gloss"]) == ["x; y", "", ""]
+    assert list(df["Form"][0:2]) == ["x", "y"]
+
+
+def test_listify():
+    df = pd.DataFrame({"Gloss": ["x\ty", "z"]})
+    df = listify(df, "Gloss", "\t")
+    assert list(df["Gloss"]) == [["x", "y"], ["z"]]
+    assert list(listify(df, "Gloss", "\t")["Gloss"]) == [["x", "y"], ["z"]]
+
+
+def test_slug():
+    reset_slugs()
+    assert slug("Example sentence") == "example-sentence"
+    assert slug("Примечание") == "primechanie"
+    assert [slug(x) for x in ["ꦕꦠꦠꦤ꧀", "ⴰⵎⵢⴰⵏ", "ꦕꦠꦠꦤ꧀", "🙂"]] == [
+        "null-0",
+        "null-1",
+        "null-0",
+        "null-2",
+    ]
+    reset_slugs()
+    assert slug("ⴰⵎⵢⴰⵏ") == "null-0"
+
+
+def test_tokenizer():
+    tokenizer = get_tokenizer({})
+    assert get_tokenizer() is tokenizer
+    old_pattern = re.compile("|".join(DELIMITERS))
+    for string in ["ty-pyra-ke", "a<in>b~b", "Ø-ta", "3-NEG>do", "", "plain"]:
+        assert tokenizer.split(string) == re.split(old_pattern, string)
+        assert tokenizer.strip(string) == re.sub(old_pattern, "", string)
+    assert tokenizer.strip("Ø-ta", zero=True) == "ta"
+
+    # regex metacharacters are taken literally
+    tokenizer = get_tokenizer({"morpheme_delimiters": [".", "="]})
+    assert tokenizer.split("ty.pyra=ke") == ["ty", "pyra", "ke"]
+    assert tokenizer.split("3.NEG=go-PST") == ["3", "NEG", "go-PST"]
+    assert tokenizer.strip("ty.pyra=ke-Ø", zero=True) == "typyrake-"
+    assert tokenizer.split("abc") == ["abc"]
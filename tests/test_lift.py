@@ -1,7 +1,13 @@
 """Tests for the cldflex.my_module module.
 """
 import pandas as pd
-from cldflex.lift2csv import convert
+from cldflex.lift2csv import (
+    convert,
+    find_examples,
+    index_examples,
+    iter_entries,
+    parse_entries,
+)
 
 
 def test_lift(data, tmp_path):
@@ -28,3 +34,60 @@ def test_lift(data, tmp_path):
         print(df1)
         print(df2)
         pd.testing.assert_frame_equal(df1, df2)
+
+
+def test_iter_entries(lift):
+    entries, senses, _ = parse_entries(iter_entries(lift))
+    assert len(entries) == 136
+    assert len({entry["ID"] for entry in entries}) == len(entries)
+    assert {sense["Entry_ID"] for sense in senses} <= {e["ID"] for e in entries}
+
+
+def test_find_examples():
+    examples = [
+        {"Text_ID": "po2", "Sentence_Number": "1", "segnum_en_phrase": "1.1"},
+        {"Text_ID": "po2", "Sentence_Number": "1", "segnum_en_phrase": "1.2"},
+        {"Text_ID": "po2", "Sentence_Number": "2", "segnum_en_phrase": "2"},
+        {"Text_ID": "ner1", "Sentence_Number": "1", "segnum_en_phrase": "1"},
+        {"Text_ID": "po2-1", "Sentence_Number": "2", "segnum_en_phrase": "2"},
+    ]
+    index = index_examples(examples, "segnum_en_phrase")
+    assert find_examples(index, "ner1", "1") == [3]
+    assert find_examples(index, "po2", "1") == [0, 1]
+    assert find_examples(index, "po2", "1", "1.2") == [1]
+    assert find_examples(index, "po2", "2") == [2, 4]
+    assert find_examples(index, "po2", "3") == []
+    # text IDs are matched as regular expressions, as with str.contains
+    assert find_examples(index, "^po2$", "2") == [2]
+    assert find_examples(index, "p.2-", "2") == [4]
+
+
+def test_senses(data, tmp_path):
+    convert(lift_file=data / "apalai.lift", output_dir=tmp_path, conf={})
+    df1 = pd.read_csv(tmp_path / "senses.csv", keep_default_na=False)
+    df2 = pd.read_csv(data / "output" / "apalai_lift_senses.csv", keep_default_na=False)
+    pd.testing.assert_frame_equal(df1, df2)
+
+
+def test_sense_names(tmp_path):
+    senses = {
+        "s1": '<gloss lang="en"><text>dog</text></gloss>',
+        "s2": '<gloss lang="en"><text>go</text></gloss><gloss lang="en"><text>walk</text></gloss>',
+        "s3": '<gloss lang="en"><text>eat</text></gloss>'
+        '<definition><form lang="en"><text>to consume food</text></form></definition>',
+        "s4": '<definition><form lang="en"><text>a kind of tree</text></form></definition>',
+    }
+    entries = "".join(
+        f'<entry id="e{i}" guid="e{i}"><lexical-unit><form lang="xyz"><text>a{i}</text></form></lexical-unit>'
+        f'<variant><form lang="xyz"><text>b{i}</text></form>'
+        '<trait name="morph-type" value="root"/></variant>'
+        f'<trait name="morph-type" value="root"/><sense id="{sense_id}">{sense}</sense></entry>'
+        for i, (sense_id, sense) in enumerate(senses.items())
+    )
+    lift_file = tmp_path / "test.lift"
+    lift_file.write_text(f'<?xml version="1.0" encoding="UTF-8" ?><lift>{entries}</lift>')
+    convert(lift_file=lift_file, output_dir=tmp_path, conf={})
+    df = pd.read_csv(tmp_path / "senses.csv", keep_default_na=False)
+    assert list(df["ID"]) == ["s1", "s2", "s3"]
+    assert list(df["Description"]) == ["dog", "go; walk", "to consume food"]
+    assert list(df["Name"]) == ["dog", "go / walk", "eat"]